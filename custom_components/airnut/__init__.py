@@ -1,27 +1,149 @@
-"""Airnut 1S integration for Home Assistant."""
+"""Airnut 1S integration for Home Assistant.
+
+This module is the thin HA adapter around the HA-free socket server. Home
+Assistant modules are imported lazily so that importing the package (for the
+standalone CLI, tools and benchmarks) does not pull in Home Assistant.
+"""
+from __future__ import annotations
+
 import logging
+from datetime import timedelta
+from typing import TYPE_CHECKING
 
-from homeassistant.config_entries import ConfigEntry
-from homeassistant.core import HomeAssistant
-from homeassistant.helpers.typing import ConfigType
+from .const import AVAILABILITY_CHECK_INTERVAL, CONF_DEVICE_ID, CONF_DEVICES, CONF_EXTERNAL_STATISTICS, CONF_IP, CONF_SCAN_INTERVAL, DOMAIN, PLATFORMS, DEFAULT_EXTERNAL_STATISTICS, DEFAULT_SCAN_INTERVAL, DEFAULT_NIGHT_START, DEFAULT_NIGHT_END, DEFAULT_NIGHT_UPDATE, SERVICE_RELOAD, SIGNAL_AVAILABILITY, SIGNAL_DEVICE_UPDATE, SNAPSHOT_INTERVAL, SNAPSHOT_KEY, SNAPSHOT_VERSION, STATISTICS_EXPORT_INTERVAL
+from .socket_server import SERVERS, AirnutAsyncSocketServer, AirnutDeviceData
 
-from .const import CONF_SCAN_INTERVAL, DOMAIN, PLATFORMS, DEFAULT_SCAN_INTERVAL, DEFAULT_NIGHT_START, DEFAULT_NIGHT_END, DEFAULT_NIGHT_UPDATE
-from .socket_server import AirnutAsyncSocketServer
+if TYPE_CHECKING:
+    from homeassistant.config_entries import ConfigEntry
+    from homeassistant.core import HomeAssistant, ServiceCall
+    from homeassistant.helpers.typing import ConfigType
 
 _LOGGER = logging.getLogger(__name__)
 
+def __getattr__(name: str):
+    """Load CONFIG_SCHEMA on first access; it needs voluptuous and Home Assistant."""
+    if name == "CONFIG_SCHEMA":
+        from .config_schema import CONFIG_SCHEMA
+
+        return CONFIG_SCHEMA
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def entry_devices(entry: ConfigEntry) -> list[dict]:
+    """Devices of a config entry: the discovered fleet, or the single manually added IP."""
+    if CONF_DEVICES in entry.data:
+        return entry.data[CONF_DEVICES]
+    return [{CONF_DEVICE_ID: None, CONF_IP: entry.data[CONF_IP]}]
+
+async def _async_start_server(hass: HomeAssistant, config: dict) -> AirnutAsyncSocketServer:
+    """Start the socket server and push parsed readings to entities via dispatcher.
+
+    The last-known state is restored from a snapshot before the server
+    starts and saved back every SNAPSHOT_INTERVAL seconds and on shutdown.
+    """
+    from homeassistant.const import EVENT_HOMEASSISTANT_STOP
+    from homeassistant.core import Event, callback
+    from homeassistant.helpers.dispatcher import async_dispatcher_send
+    from homeassistant.helpers.event import async_track_time_interval
+    from homeassistant.helpers.storage import Store
+
+    store = Store(hass, SNAPSHOT_VERSION, SNAPSHOT_KEY)
+    try:
+        snapshot = await store.async_load()
+    except Exception as e:
+        _LOGGER.warning("Failed to load Airnut snapshot: %s", e)
+        snapshot = None
+    from homeassistant.util import dt as dt_util
+
+    server = await SERVERS.async_start(DOMAIN, config, snapshot, clock=dt_util.now)
+
+    @callback
+    def _async_forward(batch: dict[str, AirnutDeviceData]) -> None:
+        # 每个发布窗口处理一次；按设备键分发，只回调批次中设备的实体
+        for key, data in batch.items():
+            async_dispatcher_send(hass, SIGNAL_DEVICE_UPDATE.format(key), data)
+            ip = server.device_ip(key)
+            if ip != key:
+                # 按IP手动添加的设备订阅其IP
+                async_dispatcher_send(hass, SIGNAL_DEVICE_UPDATE.format(ip), data)
+
+    @callback
+    def _async_save_snapshot(_now=None) -> None:
+        # Store负责原子写入（临时文件+rename），这里只按固定间隔批量触发
+        store.async_delay_save(server.snapshot)
+
+    @callback
+    def _async_check_availability(_now) -> None:
+        async_dispatcher_send(hass, SIGNAL_AVAILABILITY)
+
+    async def _async_final_save(_event: Event) -> None:
+        await store.async_save(server.snapshot())
+
+    hass.data[DOMAIN]["store"] = store
+    hass.data[DOMAIN]["unsubs"] = [
+        server.add_listener(_async_forward),
+        async_track_time_interval(hass, _async_save_snapshot, timedelta(seconds=SNAPSHOT_INTERVAL)),
+        async_track_time_interval(
+            hass, _async_check_availability, timedelta(seconds=AVAILABILITY_CHECK_INTERVAL)
+        ),
+        hass.bus.async_listen_once(EVENT_HOMEASSISTANT_STOP, _async_final_save),
+    ]
+    if config.get(CONF_EXTERNAL_STATISTICS, DEFAULT_EXTERNAL_STATISTICS):
+        from homeassistant.helpers.start import async_at_started
+
+        from .external_statistics import async_export_statistics
+
+        @callback
+        def _async_export(_now=None) -> None:
+            async_export_statistics(hass, server)
+
+        @callback
+        def _async_export_at_start(_hass: HomeAssistant) -> None:
+            # 必须标记为callback，否则HassJob会把它放到线程池执行
+            _async_export()
+
+        hass.data[DOMAIN]["unsubs"] += [
+            # 启动完成后立即补导停机期间未导出的小时
+            async_at_started(hass, _async_export_at_start),
+            async_track_time_interval(
+                hass, _async_export, timedelta(seconds=STATISTICS_EXPORT_INTERVAL)
+            ),
+        ]
+    hass.data[DOMAIN]["server"] = server
+    return server
+
 async def async_setup(hass: HomeAssistant, config: ConfigType) -> bool:
     """Set up Airnut 1S integration from YAML."""
     # 即使没有YAML配置，也初始化基础数据（避免KeyError）
     if DOMAIN not in hass.data:
         hass.data[DOMAIN] = {}
 
+    async def _async_reload(_call: ServiceCall) -> None:
+        """Re-read the YAML config and reconfigure the running server in place."""
+        import voluptuous as vol
+
+        from homeassistant.exceptions import HomeAssistantError
+        from homeassistant.helpers.reload import async_integration_yaml_config
+
+        from .config_schema import CONFIG_SCHEMA
+
+        conf = await async_integration_yaml_config(hass, DOMAIN)
+        server = SERVERS.get(DOMAIN)
+        if server is None or not conf or DOMAIN not in conf:
+            return
+        # 再校验一次，无效配置不应用到正在运行的服务端
+        try:
+            server_config = CONFIG_SCHEMA({DOMAIN: conf[DOMAIN]})[DOMAIN]
+        except vol.Invalid as e:
+            raise HomeAssistantError(f"Invalid Airnut configuration: {e}") from e
+        await server.reconfigure(server_config)
+        _LOGGER.info("Airnut socket server reconfigured")
+
+    hass.services.async_register(DOMAIN, SERVICE_RELOAD, _async_reload)
+
     if DOMAIN in config:
         # 从YAML加载配置并启动Socket服务（单例模式，避免重复）
         if "server" not in hass.data[DOMAIN]:
-            server = AirnutAsyncSocketServer(hass, config[DOMAIN])
-            await server.start()
-            hass.data[DOMAIN]["server"] = server
+            await _async_start_server(hass, config[DOMAIN])
         else:
             _LOGGER.info("Socket server already initialized from YAML, skip")
 
@@ -51,13 +173,20 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
             "night_end": DEFAULT_NIGHT_END,
             "night_update": DEFAULT_NIGHT_UPDATE
         }
-        server = AirnutAsyncSocketServer(hass, default_config)
-        await server.start()
-        hass.data[DOMAIN]["server"] = server
+        await _async_start_server(hass, default_config)
         _LOGGER.info("Airnut Socket server initialized with default config (UI mode)")
     else:
         _LOGGER.info("Socket server already exists, skip reinitialization")
 
+    # 条目的夜间设置交给服务端唯一的夜间调度，轮询与实体按同一时段判定
+    night = hass.data[DOMAIN]["server"].night
+    night.set_profile(
+        entry.entry_id,
+        [key for device in entry_devices(entry) for key in (device[CONF_DEVICE_ID], device[CONF_IP]) if key],
+        {**entry.data, **entry.options},
+    )
+    entry.async_on_unload(lambda: night.remove_profile(entry.entry_id))
+
     # 加载Sensor平台
     await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
     entry.async_on_unload(entry.add_update_listener(async_update_entry))
@@ -70,8 +199,10 @@ async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     if not hass.config_entries.async_entries(DOMAIN):
         if "server" in hass.data.get(DOMAIN, {}):
             server: AirnutAsyncSocketServer = hass.data[DOMAIN]["server"]
-            await server.stop()  # 调用完善后的stop方法
-            AirnutAsyncSocketServer._instance = None  # 重置单例
+            for unsub in hass.data[DOMAIN]["unsubs"]:
+                unsub()
+            await hass.data[DOMAIN]["store"].async_save(server.snapshot())
+            await SERVERS.async_stop(DOMAIN)  # 调用完善后的stop方法
         hass.data.pop(DOMAIN, None)
         _LOGGER.info("All Airnut entries unloaded, server stopped")
     return unload_ok
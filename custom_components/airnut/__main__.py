@@ -0,0 +1,72 @@
+"""Run the Airnut socket server headless and print parsed readings.
+
+Usage: python -m custom_components.airnut [--scan-interval 60] [--workers 4] [--listen HOST:PORT ...] [--debug]
+
+Useful for profiling the server without Home Assistant, e.g.
+``python -m cProfile -m custom_components.airnut``.
+"""
+import argparse
+import asyncio
+import logging
+
+from .const import (
+    CONF_HOST,
+    CONF_LISTENERS,
+    CONF_PORT,
+    CONF_SCAN_INTERVAL,
+    CONF_WORKERS,
+    DEFAULT_SCAN_INTERVAL,
+    DEFAULT_WORKERS,
+)
+from .socket_server import AirnutAsyncSocketServer, AirnutDeviceData
+
+
+def _print_batch(batch: dict[str, AirnutDeviceData]) -> None:
+    for device_key, data in batch.items():
+        print(
+            f"{data.last_update:%H:%M:%S} {device_key:<15} "
+            f"T={data.temperature}°C H={data.humidity}% PM2.5={data.pm25} CO2={data.co2}",
+            flush=True,
+        )
+
+
+async def _run(config: dict) -> None:
+    server = AirnutAsyncSocketServer(config)
+    server.add_listener(_print_batch)
+    await server.start()
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.stop()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Headless Airnut 1S socket server")
+    parser.add_argument("--scan-interval", type=int, default=DEFAULT_SCAN_INTERVAL)
+    parser.add_argument(
+        "--workers", type=int, default=DEFAULT_WORKERS, help="accept/parse worker processes (0 = in-process)"
+    )
+    parser.add_argument(
+        "--listen", action="append", metavar="HOST:PORT", help="listen endpoint (repeatable, default 0.0.0.0:10511)"
+    )
+    parser.add_argument("--debug", action="store_true", help="enable debug logging")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.DEBUG if args.debug else logging.INFO,
+        format="%(asctime)s %(levelname)s %(name)s: %(message)s",
+    )
+    try:
+        config = {CONF_SCAN_INTERVAL: args.scan_interval, CONF_WORKERS: args.workers}
+        if args.listen:
+            config[CONF_LISTENERS] = [
+                {CONF_HOST: host, CONF_PORT: int(port)}
+                for host, _, port in (endpoint.rpartition(":") for endpoint in args.listen)
+            ]
+        asyncio.run(_run(config))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""Binary capture of raw device traffic for offline replay.
+
+A capture file starts with CAPTURE_MAGIC followed by records of a fixed
+17-byte header and the raw payload:
+
+    timestamp (float64, Unix seconds) | connection serial (uint32)
+    | kind (uint8) | payload length (uint32) | payload
+
+``open`` records carry "ip:port" as payload; ``in``/``out`` records carry
+the bytes exactly as read from or written to the socket. Files rotate
+like logging.RotatingFileHandler: ``capture.bin`` -> ``capture.bin.1`` ...
+"""
+import logging
+import os
+import queue
+import struct
+import threading
+from collections.abc import Iterator
+from time import time as wall_clock
+from typing import NamedTuple
+
+_LOGGER = logging.getLogger(__name__)
+
+CAPTURE_MAGIC = b"AIRNUTCAP\x01"
+HEADER = struct.Struct("!dIBI")
+
+KIND_OPEN = 0
+KIND_IN = 1
+KIND_OUT = 2
+KIND_CLOSE = 3
+KIND_NAMES = {KIND_OPEN: "open", KIND_IN: "in", KIND_OUT: "out", KIND_CLOSE: "close"}
+
+
+class CaptureRecord(NamedTuple):
+    """One captured event."""
+    timestamp: float
+    serial: int
+    kind: int
+    payload: bytes
+
+
+class CaptureWriter:
+    """Append traffic records to a size-rotated capture file.
+
+    write() only packs the record and queues it, so on the event loop a
+    record costs a struct pack and a memory copy. A background thread owns
+    the file: opening, flushing and rotation never block the loop. If the
+    thread falls queue_size records behind, new records are dropped and
+    counted in ``dropped``.
+    """
+
+    def __init__(self, path: str, max_bytes: int, backups: int, queue_size: int):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.dropped = 0
+        self._file = None
+        self._size = 0
+        self._queue: queue.Queue[bytes | None] = queue.Queue(queue_size)
+        self._thread = threading.Thread(target=self._run, name="airnut-capture", daemon=True)
+        self._thread.start()
+
+    def _open(self) -> None:
+        self._file = open(self.path, "ab")  # noqa: SIM115
+        self._size = self._file.tell()
+        if not self._size:
+            self._file.write(CAPTURE_MAGIC)
+            self._size = len(CAPTURE_MAGIC)
+
+    def _rotate(self) -> None:
+        self._file.close()
+        try:
+            for i in range(self.backups - 1, 0, -1):
+                source = f"{self.path}.{i}"
+                if os.path.exists(source):
+                    os.replace(source, f"{self.path}.{i + 1}")
+            if self.backups:
+                os.replace(self.path, f"{self.path}.1")
+            else:
+                os.remove(self.path)
+        finally:
+            # 轮转失败时继续追加到原文件
+            self._open()
+
+    def _run(self) -> None:
+        """Writer thread: append queued records until close() sends None."""
+        records = self._queue
+        try:
+            self._open()
+        except OSError as e:
+            _LOGGER.error("Failed to open capture %s: %s", self.path, e)
+            while records.get() is not None:
+                pass  # 丢弃记录，直到close()
+            return
+        try:
+            while (record := records.get()) is not None:
+                if self._size + len(record) > self.max_bytes and self._size > len(CAPTURE_MAGIC):
+                    try:
+                        self._rotate()
+                    except OSError as e:
+                        _LOGGER.warning("Failed to rotate capture %s: %s", self.path, e)
+                self._file.write(record)
+                self._size += len(record)
+        finally:
+            self._file.close()
+            self._file = None
+
+    def write(self, serial: int, kind: int, payload: bytes = b"") -> None:
+        """Queue one record; the timestamp is taken now, not when it is written."""
+        try:
+            self._queue.put_nowait(HEADER.pack(wall_clock(), serial, kind, len(payload)) + payload)
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self) -> None:
+        """Write the queued records and close the file.
+
+        Blocks until the writer thread finishes; call it from an executor.
+        """
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+        if self.dropped:
+            _LOGGER.warning("Capture %s dropped %d records (writer fell behind)", self.path, self.dropped)
+
+
+def capture_files(path: str) -> list[str]:
+    """The capture file and its rotated backups, oldest first."""
+    files = []
+    i = 1
+    while os.path.exists(f"{path}.{i}"):
+        files.append(f"{path}.{i}")
+        i += 1
+    files.reverse()
+    if os.path.exists(path):
+        files.append(path)
+    return files
+
+
+def read_capture(path: str) -> Iterator[CaptureRecord]:
+    """Yield the records of one capture file; a truncated tail is ignored."""
+    with open(path, "rb") as capture:
+        if capture.read(len(CAPTURE_MAGIC)) != CAPTURE_MAGIC:
+            raise ValueError(f"{path} is not an Airnut capture file")
+        while True:
+            header = capture.read(HEADER.size)
+            if len(header) < HEADER.size:
+                return
+            timestamp, serial, kind, length = HEADER.unpack(header)
+            payload = capture.read(length)
+            if len(payload) < length:
+                return
+            yield CaptureRecord(timestamp, serial, kind, payload)
@@ -1,34 +1,57 @@
 """Config flow for Airnut 1S integration."""
 import logging
-import uuid
 import voluptuous as vol
 
 from homeassistant import config_entries
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, callback
 from homeassistant.data_entry_flow import FlowResult
+import homeassistant.helpers.config_validation as cv
 
 from .const import (
+    CONF_DEADBAND,
+    CONF_DEVICE_ID,
+    CONF_DEVICES,
     CONF_IP,
+    CONF_MAX_SILENCE,
     CONF_NIGHT_END,
     CONF_NIGHT_START,
     CONF_NIGHT_UPDATE,
     CONF_SCAN_INTERVAL,
+    DEFAULT_MAX_SILENCE,
     DEFAULT_NIGHT_END,
     DEFAULT_NIGHT_START,
     DEFAULT_NIGHT_UPDATE,
     DEFAULT_SCAN_INTERVAL,
     DOMAIN,
+    FLEET_UNIQUE_ID,
+    SENSOR_TYPES,
 )
 
 _LOGGER = logging.getLogger(__name__)
 
+# 手动添加与批量发现共用的全局配置项
+SETTINGS_SCHEMA = {
+    vol.Optional(CONF_SCAN_INTERVAL, default=DEFAULT_SCAN_INTERVAL): vol.All(
+        vol.Coerce(int), vol.Range(min=30)
+    ),
+    vol.Optional(CONF_NIGHT_START, default=DEFAULT_NIGHT_START): str,
+    vol.Optional(CONF_NIGHT_END, default=DEFAULT_NIGHT_END): str,
+    vol.Optional(CONF_NIGHT_UPDATE, default=DEFAULT_NIGHT_UPDATE): bool,
+}
+
 class AirnutConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
     """Handle a config flow for Airnut 1S (批量创建多传感器)."""
 
     VERSION = 1
 
     async def async_step_user(self, user_input: dict | None = None) -> FlowResult:
-        """Handle the initial step (仅填写设备IP和全局配置)."""
+        """Offer discovery when unconfigured devices are connected, else manual entry."""
+        if user_input is None and self._discoverable():
+            return self.async_show_menu(step_id="user", menu_options=["connected", "manual"])
+        return await self.async_step_manual(user_input)
+
+    async def async_step_manual(self, user_input: dict | None = None) -> FlowResult:
+        """Add one device by IP (仅填写设备IP和全局配置)."""
         errors = {}
 
         if user_input is not None:
@@ -37,9 +60,14 @@ class AirnutConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
                 errors[CONF_IP] = "invalid_ip"
             else:
                 # 用设备IP作为唯一ID（确保一个IP只创建一个配置条目）
-                unique_id = f"airnut_{user_input[CONF_IP]}_{uuid.uuid4().hex[:8]}"
+                unique_id = f"airnut_{user_input[CONF_IP]}"
                 await self.async_set_unique_id(unique_id)
                 self._abort_if_unique_id_configured(updates=user_input)
+                # 旧版本的unique_id带随机后缀，按IP再查一次；批量条目中的设备同样视为已配置
+                self._async_abort_entries_match({CONF_IP: user_input[CONF_IP]})
+                for entry in self._async_current_entries(include_ignore=False):
+                    if any(device[CONF_IP] == user_input[CONF_IP] for device in entry.data.get(CONF_DEVICES, [])):
+                        return self.async_abort(reason="already_configured")
                 
                 # 配置条目标题（仅显示设备IP）
                 title = f"Airnut 1S ({user_input[CONF_IP]})"
@@ -49,22 +77,71 @@ class AirnutConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
                 )
 
         # 简化schema：移除传感器类型选择
-        data_schema = vol.Schema(
-            {
-                vol.Required(CONF_IP): str,
-                vol.Optional(CONF_SCAN_INTERVAL, default=DEFAULT_SCAN_INTERVAL): vol.All(
-                    vol.Coerce(int), vol.Range(min=30)
-                ),
-                vol.Optional(CONF_NIGHT_START, default=DEFAULT_NIGHT_START): str,
-                vol.Optional(CONF_NIGHT_END, default=DEFAULT_NIGHT_END): str,
-                vol.Optional(CONF_NIGHT_UPDATE, default=DEFAULT_NIGHT_UPDATE): bool,
-            }
-        )
+        data_schema = vol.Schema({vol.Required(CONF_IP): str, **SETTINGS_SCHEMA})
 
         return self.async_show_form(
-            step_id="user", data_schema=data_schema, errors=errors
+            step_id="manual", data_schema=data_schema, errors=errors
         )
 
+    def _discoverable(self) -> dict[str, str]:
+        """Connected devices not configured yet: login identity -> IP."""
+        server = self.hass.data.get(DOMAIN, {}).get("server")
+        if server is None:
+            return {}
+        configured_ips: set[str] = set()
+        configured_ids: set[str] = set()
+        for entry in self._async_current_entries(include_ignore=False):
+            if CONF_IP in entry.data:
+                configured_ips.add(entry.data[CONF_IP])
+            for device in entry.data.get(CONF_DEVICES, []):
+                configured_ids.add(device[CONF_DEVICE_ID])
+        # 按登录标识去重；未上报标识的设备只能手动添加
+        return {
+            conn.device_id: conn.ip
+            for conn in server.connections
+            if conn.device_id
+            and conn.device_id not in configured_ids
+            and conn.ip not in configured_ips
+        }
+
+    async def async_step_connected(self, user_input: dict | None = None) -> FlowResult:
+        """Provision the selected connected devices in one config entry.
+
+        All discovered devices share the fleet entry, so N devices cost one
+        platform setup; running discovery again merges new devices into it.
+        """
+        discovered = self._discoverable()
+        if not discovered:
+            return self.async_abort(reason="no_devices_found")
+
+        if user_input is not None:
+            devices = [
+                {CONF_DEVICE_ID: device_id, CONF_IP: discovered[device_id]}
+                for device_id in user_input.pop(CONF_DEVICES)
+                if device_id in discovered
+            ]
+            await self.async_set_unique_id(FLEET_UNIQUE_ID)
+            fleet = next(
+                (entry for entry in self._async_current_entries() if entry.unique_id == FLEET_UNIQUE_ID),
+                None,
+            )
+            if fleet is not None:
+                # 合并到已有条目并重新加载（仍只有一次平台初始化）
+                self._abort_if_unique_id_configured(
+                    updates={CONF_DEVICES: [*fleet.data[CONF_DEVICES], *devices], **user_input}
+                )
+            return self.async_create_entry(
+                title="Airnut 1S",
+                data={CONF_DEVICES: devices, **user_input},
+            )
+
+        choices = {device_id: f"{device_id} ({ip})" for device_id, ip in discovered.items()}
+        data_schema = vol.Schema({
+            vol.Required(CONF_DEVICES, default=list(choices)): cv.multi_select(choices),
+            **SETTINGS_SCHEMA,
+        })
+        return self.async_show_form(step_id="connected", data_schema=data_schema)
+
     @staticmethod
     def _validate_ip(ip: str) -> bool:
         """Simple IP validation (IPv4 only)."""
@@ -78,4 +155,36 @@ class AirnutConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
 
     async def async_step_import(self, import_config: dict) -> FlowResult:
         """Handle import from YAML config."""
-        return await self.async_step_user(import_config)
\ No newline at end of file
+        return await self.async_step_user(import_config)
+
+    @staticmethod
+    @callback
+    def async_get_options_flow(config_entry: config_entries.ConfigEntry) -> config_entries.OptionsFlow:
+        """Get the options flow for this handler."""
+        return AirnutOptionsFlow(config_entry)
+
+
+class AirnutOptionsFlow(config_entries.OptionsFlow):
+    """Handle Airnut 1S options (状态写入死区与心跳间隔)."""
+
+    def __init__(self, config_entry: config_entries.ConfigEntry) -> None:
+        self._entry = config_entry
+
+    async def async_step_init(self, user_input: dict | None = None) -> FlowResult:
+        """Manage per-sensor deadbands and the max-silence heartbeat."""
+        if user_input is not None:
+            return self.async_create_entry(title="", data={**self._entry.options, **user_input})
+
+        options = self._entry.options
+        schema = {
+            vol.Optional(
+                CONF_DEADBAND.format(key),
+                default=options.get(CONF_DEADBAND.format(key), spec["deadband"]),
+            ): vol.All(vol.Coerce(float), vol.Range(min=0))
+            for key, spec in SENSOR_TYPES.items()
+        }
+        schema[
+            vol.Optional(CONF_MAX_SILENCE, default=options.get(CONF_MAX_SILENCE, DEFAULT_MAX_SILENCE))
+        ] = vol.All(vol.Coerce(int), vol.Range(min=60))
+
+        return self.async_show_form(step_id="init", data_schema=vol.Schema(schema))
\ No newline at end of file
@@ -0,0 +1,71 @@
+"""YAML schema of the Airnut socket server (``airnut:`` section).
+
+Kept out of __init__.py so that importing the package for the standalone
+CLI and tools does not require voluptuous or Home Assistant.
+"""
+import voluptuous as vol
+
+import homeassistant.helpers.config_validation as cv
+
+from .const import (
+    CONF_BUFFER_SIZE,
+    CONF_CAPTURE_PATH,
+    CONF_EXTERNAL_STATISTICS,
+    CONF_HISTORY_SIZE,
+    CONF_HOST,
+    CONF_IDLE_TIMEOUT,
+    CONF_LISTENERS,
+    CONF_MAX_CONNECTIONS,
+    CONF_NIGHT_END,
+    CONF_NIGHT_START,
+    CONF_NIGHT_UPDATE,
+    CONF_PORT,
+    CONF_PUBLISH_WINDOW,
+    CONF_QUIET_END,
+    CONF_QUIET_START,
+    CONF_QUIET_WINDOWS,
+    CONF_SCAN_INTERVAL,
+    CONF_WORKERS,
+    DOMAIN,
+    MAX_FRAME_SIZE,
+    POLL_INTERVAL_MIN,
+    REAPER_TICK,
+)
+
+TIME_OF_DAY = vol.All(cv.string, vol.Match(r"^([01]\d|2[0-3]):[0-5]\d$", msg="expected HH:MM"))
+
+
+def _int_range(minimum: int, maximum: int | None = None) -> vol.All:
+    return vol.All(vol.Coerce(int), vol.Range(min=minimum, max=maximum))
+
+
+LISTENER_SCHEMA = vol.Schema({
+    vol.Optional(CONF_HOST): cv.string,
+    vol.Optional(CONF_PORT): cv.port,
+    vol.Optional(CONF_BUFFER_SIZE): _int_range(64, MAX_FRAME_SIZE),
+    vol.Optional(CONF_MAX_CONNECTIONS): _int_range(0),  # 0 表示不限
+})
+
+QUIET_WINDOW_SCHEMA = vol.Schema({
+    vol.Required(CONF_QUIET_START): TIME_OF_DAY,
+    vol.Required(CONF_QUIET_END): TIME_OF_DAY,
+})
+
+# 不设默认值：未配置的键由服务端按自身默认值处理（如idle_timeout随扫描间隔计算）
+SERVER_SCHEMA = vol.Schema({
+    vol.Optional(CONF_SCAN_INTERVAL): _int_range(POLL_INTERVAL_MIN),
+    vol.Optional(CONF_NIGHT_START): TIME_OF_DAY,
+    vol.Optional(CONF_NIGHT_END): TIME_OF_DAY,
+    vol.Optional(CONF_NIGHT_UPDATE): cv.boolean,
+    vol.Optional(CONF_HISTORY_SIZE): _int_range(1),
+    vol.Optional(CONF_IDLE_TIMEOUT): _int_range(REAPER_TICK),
+    vol.Optional(CONF_WORKERS): _int_range(0, 64),
+    vol.Optional(CONF_PUBLISH_WINDOW): _int_range(0, 10000),  # 毫秒
+    vol.Optional(CONF_CAPTURE_PATH): cv.string,
+    vol.Optional(CONF_EXTERNAL_STATISTICS): cv.boolean,
+    vol.Optional(CONF_LISTENERS): vol.All(cv.ensure_list, vol.Length(min=1), [LISTENER_SCHEMA]),
+    vol.Optional(CONF_QUIET_WINDOWS): {cv.string: QUIET_WINDOW_SCHEMA},
+})
+
+# 允许只写一行"airnut:"（值为空）
+CONFIG_SCHEMA = vol.Schema({DOMAIN: vol.All(lambda value: value or {}, SERVER_SCHEMA)}, extra=vol.ALLOW_EXTRA)
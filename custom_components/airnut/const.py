@@ -1,55 +1,124 @@
-"""Constants for Airnut 1S integration."""
-from homeassistant.components.sensor import SensorDeviceClass, SensorStateClass  # 新增StateClass导入
+"""Constants for Airnut 1S integration.
+
+Kept free of Home Assistant imports so the socket server can run standalone;
+device_class/state_class are the string values of HA's sensor enums.
+"""
 
 # 集成域名
 DOMAIN = "airnut"
 
 # 配置项常量
 CONF_IP = "ip"
+CONF_DEVICES = "devices"  # 批量发现的设备列表，每项含 device_id 与 ip
+CONF_DEVICE_ID = "device_id"
 CONF_SENSOR_TYPE = "sensor_type"
 CONF_SCAN_INTERVAL = "scan_interval"
 CONF_NIGHT_START = "night_start"
 CONF_NIGHT_END = "night_end"
 CONF_NIGHT_UPDATE = "night_update"
+CONF_HISTORY_SIZE = "history_size"
+CONF_DEADBAND = "deadband_{}"  # 按传感器类型区分，如 deadband_co2
+CONF_MAX_SILENCE = "max_silence"
+CONF_IDLE_TIMEOUT = "idle_timeout"
+CONF_WORKERS = "workers"
+CONF_PUBLISH_WINDOW = "publish_window"
+CONF_CAPTURE_PATH = "capture_path"
+CONF_EXTERNAL_STATISTICS = "external_statistics"
+CONF_LISTENERS = "listeners"  # 监听端点列表，每项可含以下键
+CONF_HOST = "host"
+CONF_PORT = "port"
+CONF_BUFFER_SIZE = "buffer_size"
+CONF_MAX_CONNECTIONS = "max_connections"
+CONF_QUIET_WINDOWS = "quiet_windows"  # 按设备IP配置的免打扰时段，每项含以下键
+CONF_QUIET_START = "start"
+CONF_QUIET_END = "end"
 
 # 默认配置
 DEFAULT_SCAN_INTERVAL = 600
 DEFAULT_NIGHT_START = "23:00"
 DEFAULT_NIGHT_END = "06:00"
 DEFAULT_NIGHT_UPDATE = True
+NIGHT_RECHECK_INTERVAL = 3600  # 夜间状态定时器的最长间隔（秒），防止系统时间跳变后错过切换
+DEFAULT_HISTORY_SIZE = 1440  # 每设备保留的历史样本数（约34KB/设备）
+DEFAULT_MAX_SILENCE = 3600  # 数值无变化时最长多久强制写一次状态（秒）
 
 # Socket配置
 SOCKET_HOST = "0.0.0.0"
 SOCKET_PORT = 10511
 SOCKET_BUFFER_SIZE = 1024
+DEFAULT_MAX_CONNECTIONS = 0  # 单个监听端点的连接上限，0表示不限
+MAX_FRAME_SIZE = 16384  # 单帧上限，防止异常设备无限占用内存
+POLL_DRAIN_TIMEOUT = 5  # 单设备写入超时（秒），超时即断开
+OUTBOX_SIZE = 8  # 每个连接待发送命令队列上限，溢出即断开
+POLL_INTERVAL_MIN = 30  # 数据快速变化时的最短轮询间隔（秒）
+POLL_INTERVAL_MAX_FACTOR = 4  # 数据平稳或夜间时最长放宽到 scan_interval 的倍数
+IDLE_TIMEOUT_FACTOR = 2  # 默认空闲超时 = 最长轮询间隔的倍数，超时断开连接且实体不可用
+REAPER_TICK = 5  # 空闲连接回收时间轮刻度（秒）
+REAPER_SLOTS = 256
+# TCP keepalive：空闲60秒后开始探测，每15秒一次，4次无响应判定断开
+KEEPALIVE_IDLE = 60
+KEEPALIVE_INTERVAL = 15
+KEEPALIVE_COUNT = 4
+
+# 读数在该窗口（毫秒）内合并为一批发布，一个批次只触发一次dispatcher信号
+DEFAULT_PUBLISH_WINDOW = 20
+
+# 多进程接入：workers>0时由子进程监听端口并解析，读数经Unix socket转发给主进程
+DEFAULT_WORKERS = 0
+WORKER_RESTART_DELAY = 5  # 子进程异常退出后的重启检查间隔（秒）
+
+# 流量抓包（配置capture_path后启用），按大小轮转
+CAPTURE_MAX_BYTES = 16 * 1024 * 1024
+CAPTURE_BACKUPS = 4
+CAPTURE_QUEUE_SIZE = 10000  # 写线程积压超过该记录数时丢弃新记录，不阻塞事件循环
+
+# 长期统计：按小时聚合后作为外部统计导入recorder
+DEFAULT_EXTERNAL_STATISTICS = True
+STATISTICS_EXPORT_INTERVAL = 300  # 检查并导出已结束小时的间隔（秒）
+
+# 状态快照（热重启后立即恢复最近读数）
+SNAPSHOT_KEY = f"{DOMAIN}.snapshot"
+SNAPSHOT_VERSION = 1
+SNAPSHOT_INTERVAL = 300  # 定期批量写盘间隔（秒）
+
+# 设备数据推送信号
+SIGNAL_DEVICE_UPDATE = f"{DOMAIN}_device_update_{{}}"  # 按设备键（登录标识，否则IP）分发的最新读数
+SIGNAL_AVAILABILITY = f"{DOMAIN}_availability"  # 定期触发，实体按数据新鲜度刷新可用性
+AVAILABILITY_CHECK_INTERVAL = 60  # 秒
+SERVICE_RELOAD = "reload"  # 重新读取YAML并就地重配Socket服务
 
 # 传感器类型规范配置（新增state_class）
 SENSOR_TYPES = {
     "temperature": {
         "name": "Temperature",
-        "device_class": SensorDeviceClass.TEMPERATURE,
+        "device_class": "temperature",
         "native_unit_of_measurement": "°C",
-        "state_class": SensorStateClass.MEASUREMENT  # 新增状态类
+        "state_class": "measurement",  # 新增状态类
+        "deadband": 0.2,  # 变化小于该值时不写状态
     },
     "humidity": {
         "name": "Humidity",
-        "device_class": SensorDeviceClass.HUMIDITY,
+        "device_class": "humidity",
         "native_unit_of_measurement": "%",
-        "state_class": SensorStateClass.MEASUREMENT
+        "state_class": "measurement",
+        "deadband": 1.0,
     },
     "pm25": {
         "name": "PM2.5",
-        "device_class": SensorDeviceClass.PM25,
+        "device_class": "pm25",
         "native_unit_of_measurement": "µg/m³",
-        "state_class": SensorStateClass.MEASUREMENT
+        "state_class": "measurement",
+        "deadband": 2,
     },
     "co2": {
         "name": "CO2",
-        "device_class": SensorDeviceClass.CO2,
+        "device_class": "carbon_dioxide",
         "native_unit_of_measurement": "ppm",
-        "state_class": SensorStateClass.MEASUREMENT
+        "state_class": "measurement",
+        "deadband": 20,
     },
 }
 
 # 集成平台定义
-PLATFORMS = ["sensor"]
\ No newline at end of file
+PLATFORMS = ["sensor"]
+FLEET_UNIQUE_ID = f"{DOMAIN}_fleet"  # 批量发现的设备共用一个配置条目
\ No newline at end of file
@@ -0,0 +1,56 @@
+"""Diagnostics support for Airnut 1S."""
+from __future__ import annotations
+
+from time import monotonic
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+
+from . import entry_devices
+from .const import CONF_DEVICE_ID, CONF_IP, DOMAIN
+from .socket_server import AirnutDeviceData
+
+
+def _reading(data: AirnutDeviceData | None) -> dict | None:
+    """A reading with its receipt time as wall-clock time (单调时钟时间戳离开本进程无意义)."""
+    if data is None:
+        return None
+    last_update = data.last_update
+    return {
+        "temperature": data.temperature,
+        "humidity": data.humidity,
+        "pm25": data.pm25,
+        "co2": data.co2,
+        "last_update": last_update.isoformat() if last_update else None,
+    }
+
+
+async def async_get_config_entry_diagnostics(hass: HomeAssistant, entry: ConfigEntry) -> dict:
+    """Return socket server metrics and live connections."""
+    server = hass.data.get(DOMAIN, {}).get("server")
+    if server is None:
+        return {"entry": dict(entry.data), "server": None}
+
+    now = monotonic()
+    return {
+        "entry": dict(entry.data),
+        "server": server.metrics.as_dict(),
+        "connections": [
+            {
+                "ip": conn.ip,
+                "port": conn.peer[1],
+                "device_id": conn.device_id,
+                "idle_seconds": round(now - conn.last_seen, 1),
+                "poll_interval": server.poll_interval(conn),
+                "queued": len(conn.outbox),
+            }
+            for conn in server.connections
+        ],
+        "device_data": {
+            key: _reading(server.get_device_data(key))
+            for key in (
+                device[CONF_DEVICE_ID] or server.device_key(device[CONF_IP]) for device in entry_devices(entry)
+            )
+        },
+    }
+
@@ -0,0 +1,63 @@
+"""Push hourly Airnut statistics to the recorder as external statistics.
+
+Long-term graphs then work even when the raw sensors are excluded from
+the recorder. Hours that closed while Home Assistant was down are rebuilt
+from the restored history and imported in the same batch.
+"""
+from __future__ import annotations
+
+import logging
+from collections import defaultdict
+from datetime import datetime, timezone
+
+from homeassistant.components.recorder.models import StatisticData, StatisticMetaData
+from homeassistant.components.recorder.statistics import async_add_external_statistics
+from homeassistant.core import HomeAssistant
+from homeassistant.util import slugify
+
+from .const import DOMAIN, SENSOR_TYPES
+from .longterm import HourlyStat
+from .socket_server import AirnutAsyncSocketServer
+
+_LOGGER = logging.getLogger(__name__)
+
+
+def statistic_id(device_key: str, field: str) -> str:
+    """External statistic id of one device field, e.g. airnut:192_168_1_20_co2.
+
+    The key is the device's login identity, or its IP when it has none.
+    """
+    return f"{DOMAIN}:{slugify(device_key)}_{field}"
+
+
+def async_export_statistics(hass: HomeAssistant, server: AirnutAsyncSocketServer) -> int:
+    """Import every hour closed since the last export; returns the number of rows."""
+    if "recorder" not in hass.config.components:
+        return 0  # 小时桶留在服务端，recorder就绪后再导出
+    grouped: dict[tuple[str, str], list[HourlyStat]] = defaultdict(list)
+    for stat in server.pop_hourly_statistics():
+        grouped[(stat.key, stat.field)].append(stat)
+
+    # 每个统计项一次批量导入，停机补数据也在同一次调用中完成
+    for (device_key, field), stats in grouped.items():
+        metadata = StatisticMetaData(
+            has_mean=True,
+            has_sum=False,
+            name=f"Airnut 1S ({device_key}) {SENSOR_TYPES[field]['name']}",
+            source=DOMAIN,
+            statistic_id=statistic_id(device_key, field),
+            unit_of_measurement=SENSOR_TYPES[field]["native_unit_of_measurement"],
+        )
+        async_add_external_statistics(hass, metadata, [
+            StatisticData(
+                start=datetime.fromtimestamp(stat.start, timezone.utc),
+                mean=stat.mean,
+                min=stat.min,
+                max=stat.max,
+            )
+            for stat in sorted(stats, key=lambda stat: stat.start)
+        ])
+    rows = sum(len(stats) for stats in grouped.values())
+    if rows:
+        _LOGGER.debug("Exported %d hourly statistics for %d series", rows, len(grouped))
+    return rows
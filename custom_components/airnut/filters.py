@@ -0,0 +1,37 @@
+"""State-write filters for Airnut 1S sensors."""
+from time import monotonic
+
+
+class DeadbandFilter:
+    """Drop readings that stay within a deadband of the last written value.
+
+    A reading is written when it differs from the last written value by at
+    least ``deadband``, or when ``max_silence`` seconds have passed since the
+    last write (heartbeat). Comparing against the last written value rather
+    than the last reading lets slow drifts through once they add up.
+    """
+
+    __slots__ = ("deadband", "max_silence", "suppressed", "_last_value", "_last_write")
+
+    def __init__(self, deadband: float, max_silence: float):
+        self.deadband = deadband
+        self.max_silence = max_silence
+        self.suppressed = 0  # 被过滤掉的写入次数
+        self._last_value: float | None = None
+        self._last_write = 0.0
+
+    def should_write(self, value: float | None) -> bool:
+        """Return True if value should be written to the state machine."""
+        now = monotonic()
+        last = self._last_value
+        if (
+            last is not None
+            and value is not None
+            and (value == last or abs(value - last) < self.deadband)
+            and now - self._last_write < self.max_silence
+        ):
+            self.suppressed += 1
+            return False
+        self._last_value = value
+        self._last_write = now
+        return True
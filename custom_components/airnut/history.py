@@ -0,0 +1,152 @@
+"""Fixed-size per-device reading history for Airnut 1S."""
+import base64
+from array import array
+from time import time
+
+# 聚合窗口：名称 -> 秒
+HISTORY_WINDOWS = {"5m": 300, "1h": 3600, "24h": 86400}
+HISTORY_FIELDS = ("temperature", "humidity", "pm25", "co2")
+
+# 每个样本：时间戳(8字节) + 4个float32指标(16字节)
+BYTES_PER_SAMPLE = 8 + 4 * len(HISTORY_FIELDS)
+
+
+class DeviceHistory:
+    """Array-backed ring buffer of one device's readings.
+
+    Memory is allocated once: ``capacity * BYTES_PER_SAMPLE`` bytes (24 bytes
+    per sample, about 34 KiB for the default 1440 samples). Appends are O(1);
+    window aggregates binary-search the window start and scan only the
+    samples inside it.
+    """
+
+    __slots__ = ("capacity", "_ts", "_values", "_next", "_size")
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._ts = array("d", bytes(8 * capacity))
+        self._values = {field: array("f", bytes(4 * capacity)) for field in HISTORY_FIELDS}
+        self._next = 0
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def append(self, timestamp: float, temperature: float, humidity: float, pm25: float, co2: float) -> None:
+        """Store one reading, overwriting the oldest once full."""
+        i = self._next
+        self._ts[i] = timestamp
+        values = self._values
+        values["temperature"][i] = temperature
+        values["humidity"][i] = humidity
+        values["pm25"][i] = pm25
+        values["co2"][i] = co2
+        self._next = (i + 1) % self.capacity
+        if self._size < self.capacity:
+            self._size += 1
+
+    def _physical(self, logical: int) -> int:
+        """Map logical index (0 = oldest) to array slot."""
+        return (self._next - self._size + logical) % self.capacity
+
+    def _window_start(self, since: float) -> int:
+        """Logical index of the first sample with timestamp >= since."""
+        size = self._size
+        lo, hi = 0, size
+        ts = self._ts
+        # 环形数组按逻辑顺序二分（时间戳单调递增）
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if ts[self._physical(mid)] < since:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def aggregate(self, field: str, window: float, now: float | None = None) -> dict | None:
+        """Return min/max/mean of field over the last window seconds, or None if empty."""
+        if now is None:
+            now = time()
+        start = self._window_start(now - window)
+        count = self._size - start
+        if count <= 0:
+            return None
+        column = self._values[field]
+        first = self._physical(start)
+        if first + count <= self.capacity:
+            samples = column[first:first + count]
+        else:
+            samples = column[first:] + column[:first + count - self.capacity]
+        return {
+            "min": round(min(samples), 1),
+            "max": round(max(samples), 1),
+            "mean": round(sum(samples) / count, 1),
+        }
+
+    def span(self, now: float | None = None) -> float:
+        """Seconds of history covered: from the oldest retained sample to now."""
+        if not self._size:
+            return 0.0
+        if now is None:
+            now = time()
+        return now - self._ts[self._physical(0)]
+
+    def summary(self, field: str, now: float | None = None) -> dict[str, float]:
+        """Flatten aggregates for every window, e.g. {"min_5m": ..., "mean_24h": ...}.
+
+        Retention is a sample count, so at short poll intervals a full
+        buffer may cover less than the longest window. Windows reaching
+        past the oldest retained sample are then left out rather than
+        reported over a shorter span.
+        """
+        if now is None:
+            now = time()
+        # 缓冲区已满说明更早的样本已被覆盖；未满时历史本就从首个样本开始
+        covered = self.span(now) if self._size == self.capacity else float("inf")
+        result: dict[str, float] = {}
+        for name, window in HISTORY_WINDOWS.items():
+            if window > covered:
+                continue
+            stats = self.aggregate(field, window, now)
+            if stats is None:
+                continue
+            for key, value in stats.items():
+                result[f"{key}_{name}"] = value
+        return result
+
+    def samples(self, since: float = 0.0):
+        """Yield (timestamp, temperature, humidity, pm25, co2) from since onward, oldest first."""
+        ts = self._ts
+        columns = [self._values[field] for field in HISTORY_FIELDS]
+        for logical in range(self._window_start(since), self._size):
+            i = self._physical(logical)
+            yield (ts[i], *(column[i] for column in columns))
+
+    def _ordered(self, column: array) -> array:
+        """Copy of a column from oldest to newest sample."""
+        first = self._physical(0)
+        if first + self._size <= self.capacity:
+            return column[first:first + self._size]
+        return column[first:] + column[:first + self._size - self.capacity]
+
+    def to_dict(self) -> dict[str, str]:
+        """Serialize as base64 packed arrays, oldest sample first."""
+        data = {"ts": base64.b64encode(self._ordered(self._ts).tobytes()).decode("ascii")}
+        for field, column in self._values.items():
+            data[field] = base64.b64encode(self._ordered(column).tobytes()).decode("ascii")
+        return data
+
+    @classmethod
+    def from_dict(cls, data: dict[str, str], capacity: int) -> "DeviceHistory":
+        """Rebuild from to_dict output, keeping the newest capacity samples."""
+        history = cls(capacity)
+        ts = array("d", base64.b64decode(data["ts"]))
+        columns = []
+        for field in HISTORY_FIELDS:
+            column = array("f", base64.b64decode(data[field]))
+            if len(column) != len(ts):
+                raise ValueError(f"History column {field} has {len(column)} samples, expected {len(ts)}")
+            columns.append(column)
+        for i in range(max(len(ts) - capacity, 0), len(ts)):
+            history.append(ts[i], *(column[i] for column in columns))
+        return history
@@ -0,0 +1,98 @@
+"""Incremental hourly statistics for long-term export.
+
+Each reading updates a running count/sum/min/max for its device's current
+UTC hour; when the hour rolls over the bucket is closed and queued for
+export. Only hourly buckets are kept: the recorder derives daily and
+longer periods from hourly statistics itself.
+"""
+from collections.abc import Hashable, Iterable
+from typing import NamedTuple
+
+from .history import HISTORY_FIELDS
+
+HOUR = 3600
+
+
+class HourlyStat(NamedTuple):
+    """One closed hour of one field of one device."""
+    key: Hashable
+    field: str
+    start: float  # 整点的Unix时间戳（UTC）
+    mean: float
+    min: float
+    max: float
+
+
+class _HourBucket:
+    """Running aggregates of every field over one hour."""
+
+    __slots__ = ("start", "count", "sums", "mins", "maxs")
+
+    def __init__(self, start: float):
+        self.start = start
+        self.count = 0
+        self.sums = [0.0] * len(HISTORY_FIELDS)
+        self.mins = [float("inf")] * len(HISTORY_FIELDS)
+        self.maxs = [float("-inf")] * len(HISTORY_FIELDS)
+
+    def add(self, values: Iterable[float]) -> None:
+        sums, mins, maxs = self.sums, self.mins, self.maxs
+        for i, value in enumerate(values):
+            sums[i] += value
+            if value < mins[i]:
+                mins[i] = value
+            if value > maxs[i]:
+                maxs[i] = value
+        self.count += 1
+
+
+class HourlyAggregator:
+    """Per-device hourly mean/min/max built as readings arrive.
+
+    ``exported_until`` is the end of the newest hour handed out by
+    pop_completed(); it is kept in the snapshot so a restart can rebuild
+    the hours that were still open, or not yet exported, from history.
+    """
+
+    def __init__(self):
+        self._open: dict[Hashable, _HourBucket] = {}
+        self._completed: list[HourlyStat] = []
+        self.exported_until = 0.0
+
+    def add(self, key: Hashable, timestamp: float, values: Iterable[float]) -> None:
+        """Add one reading; values follow HISTORY_FIELDS order."""
+        start = timestamp - timestamp % HOUR
+        bucket = self._open.get(key)
+        if bucket is None or bucket.start != start:
+            if bucket is not None:
+                if start < bucket.start:
+                    return  # 乱序的旧读数，所在小时已关闭
+                self._close(key, bucket)
+            if start < self.exported_until:
+                return  # 该小时已导出
+            bucket = self._open[key] = _HourBucket(start)
+        bucket.add(values)
+
+    def _close(self, key: Hashable, bucket: _HourBucket) -> None:
+        for i, field in enumerate(HISTORY_FIELDS):
+            self._completed.append(HourlyStat(
+                key,
+                field,
+                bucket.start,
+                round(bucket.sums[i] / bucket.count, 2),
+                round(bucket.mins[i], 2),
+                round(bucket.maxs[i], 2),
+            ))
+
+    def pop_completed(self, now: float) -> list[HourlyStat]:
+        """Close every hour that ended before now and return all closed buckets."""
+        current = now - now % HOUR
+        for key, bucket in list(self._open.items()):
+            if bucket.start < current:
+                # 设备跨整点未上报，也要关闭上一个小时
+                del self._open[key]
+                self._close(key, bucket)
+        completed, self._completed = self._completed, []
+        if completed:
+            self.exported_until = max(self.exported_until, max(stat.start for stat in completed) + HOUR)
+        return completed
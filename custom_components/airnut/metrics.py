@@ -0,0 +1,217 @@
+"""Lightweight runtime metrics for the Airnut socket server.
+
+Recording is a handful of integer/float operations on preallocated objects,
+cheap enough to stay enabled on the hot path.
+"""
+from array import array
+from bisect import bisect_left
+from time import monotonic
+
+# 直方图桶上界（秒），覆盖从100µs的解析耗时到数十秒的轮询往返
+LATENCY_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0,
+)
+
+
+class Histogram:
+    """Fixed-bucket histogram of durations in seconds."""
+
+    __slots__ = ("bounds", "counts", "count", "total", "max")
+
+    def __init__(self, bounds: tuple[float, ...] = LATENCY_BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # 最后一个桶为 +Inf
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        """Record one duration."""
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q: float) -> float | None:
+        """Upper bound of the bucket holding the q-quantile."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return min(self.bounds[i], self.max) if i < len(self.bounds) else self.max
+        return self.max
+
+    def as_dict(self) -> dict:
+        """Snapshot in milliseconds for diagnostics."""
+        def ms(value: float | None) -> float | None:
+            return None if value is None else round(value * 1000, 3)
+
+        return {
+            "count": self.count,
+            "mean_ms": ms(self.total / self.count) if self.count else None,
+            "p50_ms": ms(self.quantile(0.5)),
+            "p99_ms": ms(self.quantile(0.99)),
+            "max_ms": ms(self.max) if self.count else None,
+        }
+
+
+class DeviceCounters:
+    """Connection counters and last poll round-trip of one device."""
+
+    __slots__ = ("connections", "disconnects", "reconnects", "frames", "last_rtt")
+
+    def __init__(self):
+        self.connections = 0
+        self.disconnects = 0
+        self.reconnects = 0
+        self.frames = 0
+        self.last_rtt: float | None = None
+
+    def as_dict(self) -> dict:
+        return {
+            "connections": self.connections,
+            "disconnects": self.disconnects,
+            "reconnects": self.reconnects,
+            "frames": self.frames,
+            "last_rtt_ms": None if self.last_rtt is None else round(self.last_rtt * 1000, 1),
+        }
+
+
+class ListenerCounters:
+    """Connection and throughput counters of one listen endpoint."""
+
+    __slots__ = ("accepted", "rejected", "active", "bytes")
+
+    def __init__(self):
+        self.accepted = 0
+        self.rejected = 0  # 超过max_connections被拒绝的连接
+        self.active = 0
+        self.bytes = 0
+
+    def as_dict(self) -> dict:
+        return {
+            "accepted": self.accepted,
+            "rejected": self.rejected,
+            "active": self.active,
+            "bytes": self.bytes,
+        }
+
+
+class ArrivalRate:
+    """Per-second arrival counts over a sliding window.
+
+    Two fixed arrays indexed by ``second % window`` hold the count and the
+    second it belongs to; a slot is reset lazily when a newer second reuses
+    it, so recording is O(1) with no allocation.
+    """
+
+    __slots__ = ("window", "_counts", "_seconds")
+
+    def __init__(self, window: int):
+        self.window = window
+        self._counts = array("I", bytes(4 * window))
+        self._seconds = array("q", [-1] * window)
+
+    def record(self, now: float | None = None) -> None:
+        """Count one arrival at now (monotonic seconds)."""
+        second = int(monotonic() if now is None else now)
+        slot = second % self.window
+        if self._seconds[slot] != second:
+            self._seconds[slot] = second
+            self._counts[slot] = 0
+        self._counts[slot] += 1
+
+    def distribution(self, now: float | None = None) -> dict:
+        """Summarize arrivals per second over the last window seconds.
+
+        ``histogram`` maps "arrivals in one second" to "number of seconds
+        with that many arrivals"; a flat ingest load shows up as most
+        seconds at 0 or 1 and a small max_per_second.
+        """
+        current = int(monotonic() if now is None else now)
+        oldest = current - self.window + 1
+        histogram: dict[int, int] = {}
+        total = peak = 0
+        for slot in range(self.window):
+            count = self._counts[slot] if self._seconds[slot] >= oldest else 0
+            histogram[count] = histogram.get(count, 0) + 1
+            total += count
+            peak = max(peak, count)
+        return {
+            "window_seconds": self.window,
+            "arrivals": total,
+            "mean_per_second": round(total / self.window, 3),
+            "max_per_second": peak,
+            "histogram": dict(sorted(histogram.items())),
+        }
+
+
+class ServerMetrics:
+    """All counters and histograms kept by the socket server."""
+
+    def __init__(self, arrival_window: int):
+        self.frames = 0
+        self.bytes = 0
+        self.parse_errors = 0
+        self.parse_time = Histogram()  # 每次读取的解码耗时
+        self.poll_rtt = Histogram()  # get发出到收到post
+        self.drain_wait = Histogram()  # writer.drain()等待时间
+        self.get_delivery = Histogram()  # get入队到写出（drain完成）的耗时
+        self.gets_delivered = 0
+        self.coalesced = 0  # 与队列中未发出的get合并的次数
+        self.outbox_overflows = 0  # 发送队列溢出而断开的次数
+        self.publish_delay = Histogram()  # 读数入库到随批次发布的等待时间
+        self.batches = 0
+        self.published = 0
+        self.arrivals = ArrivalRate(arrival_window)
+        self.devices: dict[str, DeviceCounters] = {}
+        self.listeners: dict[str, ListenerCounters] = {}  # "host:port" -> counters
+
+    def device(self, key: str) -> DeviceCounters:
+        """Counters for one device, created on first use."""
+        counters = self.devices.get(key)
+        if counters is None:
+            counters = self.devices[key] = DeviceCounters()
+        return counters
+
+    def listener(self, name: str) -> ListenerCounters:
+        """Counters for one listen endpoint, created on first use."""
+        counters = self.listeners.get(name)
+        if counters is None:
+            counters = self.listeners[name] = ListenerCounters()
+        return counters
+
+    def connected(self, key: str) -> None:
+        counters = self.device(key)
+        if counters.connections:
+            counters.reconnects += 1
+        counters.connections += 1
+
+    def disconnected(self, key: str) -> None:
+        self.device(key).disconnects += 1
+
+    def as_dict(self) -> dict:
+        """Snapshot of every metric for diagnostics."""
+        return {
+            "frames": self.frames,
+            "bytes": self.bytes,
+            "parse_errors": self.parse_errors,
+            "parse_time": self.parse_time.as_dict(),
+            "poll_rtt": self.poll_rtt.as_dict(),
+            "drain_wait": self.drain_wait.as_dict(),
+            "get_delivery": self.get_delivery.as_dict(),
+            "gets_delivered": self.gets_delivered,
+            "coalesced": self.coalesced,
+            "outbox_overflows": self.outbox_overflows,
+            "publish_delay": self.publish_delay.as_dict(),
+            "batches": self.batches,
+            "mean_batch_size": round(self.published / self.batches, 2) if self.batches else None,
+            "arrivals": self.arrivals.distribution(),
+            "listeners": {name: counters.as_dict() for name, counters in self.listeners.items()},
+            "devices": {key: counters.as_dict() for key, counters in self.devices.items()},
+        }
@@ -0,0 +1,209 @@
+"""Night and per-device quiet windows (夜间与免打扰时段).
+
+The socket server owns one NightSchedule. It holds the server's default
+night settings, the night settings of each config entry (a profile that
+covers that entry's devices) and the per-device quiet windows. Windows
+are parsed once and the current state is kept as plain attributes; one
+loop timer fires at the next window boundary and flips them, so the
+poller and every entity read the same cached booleans instead of parsing
+times on each update.
+"""
+import asyncio
+import logging
+from collections.abc import Callable, Iterable, Mapping
+from datetime import datetime, time, timedelta
+
+from .const import (
+    CONF_NIGHT_END,
+    CONF_NIGHT_START,
+    CONF_NIGHT_UPDATE,
+    CONF_QUIET_END,
+    CONF_QUIET_START,
+    CONF_QUIET_WINDOWS,
+    DEFAULT_NIGHT_END,
+    DEFAULT_NIGHT_START,
+    DEFAULT_NIGHT_UPDATE,
+    NIGHT_RECHECK_INTERVAL,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class TimeWindow:
+    """A daily [start, end) window; it wraps past midnight when end < start."""
+
+    __slots__ = ("start", "end")
+
+    def __init__(self, start: time, end: time):
+        self.start = start
+        self.end = end
+
+    def __repr__(self) -> str:
+        return f"{self.start:%H:%M}-{self.end:%H:%M}"
+
+    def contains(self, now: time) -> bool:
+        """True if the time of day now lies in the window (start == end: never)."""
+        if self.start <= self.end:
+            return self.start <= now < self.end
+        # 跨午夜（如 23:00 - 06:00）
+        return now >= self.start or now < self.end
+
+    def next_boundary(self, now: datetime) -> datetime:
+        """The first start or end instant after now."""
+        candidates = []
+        for edge in (self.start, self.end):
+            at = now.replace(hour=edge.hour, minute=edge.minute, second=0, microsecond=0)
+            if at <= now:
+                at += timedelta(days=1)
+            candidates.append(at)
+        return min(candidates)
+
+
+def parse_window(start: str, end: str, name: str) -> TimeWindow | None:
+    """Parse an HH:MM window once; an invalid one is logged and disabled."""
+    try:
+        return TimeWindow(
+            datetime.strptime(start, "%H:%M").time(),
+            datetime.strptime(end, "%H:%M").time(),
+        )
+    except (TypeError, ValueError):
+        _LOGGER.warning("Invalid %s window %s - %s (expected HH:MM), ignoring it", name, start, end)
+        return None
+
+
+class NightProfile:
+    """One set of night settings with its cached state."""
+
+    __slots__ = ("window", "night_update", "is_night")
+
+    def __init__(self, config: Mapping, name: str = "night"):
+        self.window = parse_window(
+            config.get(CONF_NIGHT_START, DEFAULT_NIGHT_START),
+            config.get(CONF_NIGHT_END, DEFAULT_NIGHT_END),
+            name,
+        )
+        self.night_update = config.get(CONF_NIGHT_UPDATE, DEFAULT_NIGHT_UPDATE)
+        self.is_night = False
+
+
+class NightSchedule:
+    """Cached night and quiet-window state with one timer per transition.
+
+    Devices are looked up by login identity, then by IP; a device that no
+    config entry claims follows the server's default settings. A device
+    IP listed under ``quiet_windows`` is not polled, and its readings are
+    not written, inside its own window regardless of the night settings.
+    ``now`` returns the current local time; Home Assistant passes its own
+    time zone aware clock.
+    """
+
+    def __init__(self, config: Mapping, now: Callable[[], datetime] = datetime.now):
+        self.now = now
+        self._handle: asyncio.TimerHandle | None = None
+        self._running = False
+        self._profiles: dict[str, NightProfile] = {}  # 配置条目ID -> 夜间设置
+        self._devices: dict[str, NightProfile] = {}  # 设备标识或IP -> 所属配置条目的夜间设置
+        self.quiet_now: frozenset[str] = frozenset()
+        self.configure(config)
+
+    def configure(self, config: Mapping) -> None:
+        """Apply the server settings: default night window and quiet windows.
+
+        Profiles set by config entries are kept.
+        """
+        self.default = NightProfile(config)
+        self.quiet: dict[str, TimeWindow] = {}
+        for ip, window in (config.get(CONF_QUIET_WINDOWS) or {}).items():
+            parsed = parse_window(window.get(CONF_QUIET_START), window.get(CONF_QUIET_END), f"quiet ({ip})")
+            if parsed:
+                self.quiet[ip] = parsed
+        self._changed()
+
+    def set_profile(self, owner: str, devices: Iterable[str], config: Mapping) -> None:
+        """Apply a config entry's night settings to its devices (by identity or IP)."""
+        old = self._profiles.pop(owner, None)
+        if old is not None:
+            self._devices = {key: p for key, p in self._devices.items() if p is not old}
+        profile = self._profiles[owner] = NightProfile(config, f"night ({owner})")
+        for key in devices:
+            self._devices[key] = profile
+        self._changed()
+
+    def remove_profile(self, owner: str) -> None:
+        """Return the devices of a config entry to the default settings."""
+        profile = self._profiles.pop(owner, None)
+        if profile is not None:
+            self._devices = {key: p for key, p in self._devices.items() if p is not profile}
+            self._changed()
+
+    def _profile(self, ip: str, device_id: str | None) -> NightProfile:
+        devices = self._devices
+        return devices.get(device_id) or devices.get(ip) or self.default
+
+    def is_night(self, ip: str, device_id: str | None = None) -> bool:
+        """True while the device is inside its night window."""
+        return self._profile(ip, device_id).is_night
+
+    def suppressed(self, ip: str, device_id: str | None = None) -> bool:
+        """True while polls and state writes of the device are off."""
+        profile = self._profile(ip, device_id)
+        return (profile.is_night and not profile.night_update) or ip in self.quiet_now
+
+    def _windows(self) -> list[TimeWindow]:
+        profiles = (self.default, *self._profiles.values())
+        return [p.window for p in profiles if p.window] + list(self.quiet.values())
+
+    def next_transition(self, now: datetime | None = None) -> datetime | None:
+        """The next instant at which any window opens or closes."""
+        now = now or self.now()
+        return min((window.next_boundary(now) for window in self._windows()), default=None)
+
+    def refresh(self) -> bool:
+        """Re-evaluate the windows at the current time; returns True on a change."""
+        clock = self.now().time()
+        changed = False
+        for profile in (self.default, *self._profiles.values()):
+            is_night = profile.window is not None and profile.window.contains(clock)
+            changed |= is_night != profile.is_night
+            profile.is_night = is_night
+        quiet_now = frozenset(ip for ip, window in self.quiet.items() if window.contains(clock))
+        changed |= quiet_now != self.quiet_now
+        self.quiet_now = quiet_now
+        if changed:
+            _LOGGER.debug("Night state changed, quiet devices %s", sorted(quiet_now))
+        return changed
+
+    def start(self) -> None:
+        """Evaluate now and arm the transition timer (needs a running loop)."""
+        self._running = True
+        self._changed()
+
+    def stop(self) -> None:
+        """Cancel the transition timer."""
+        self._running = False
+        if self._handle:
+            self._handle.cancel()
+            self._handle = None
+
+    def _changed(self) -> None:
+        """Windows were added or replaced: re-evaluate and re-arm the timer."""
+        self.refresh()
+        if self._running:
+            if self._handle:
+                self._handle.cancel()
+                self._handle = None
+            self._arm()
+
+    def _arm(self) -> None:
+        now = self.now()
+        transition = self.next_transition(now)
+        if transition is None:
+            return
+        # 定时器走单调时钟；间隔设上限，系统时间或夏令时跳变后最多延迟一个周期
+        delay = min((transition - now).total_seconds(), NIGHT_RECHECK_INTERVAL)
+        self._handle = asyncio.get_running_loop().call_later(delay, self._on_timer)
+
+    def _on_timer(self) -> None:
+        self._handle = None
+        self.refresh()
+        self._arm()
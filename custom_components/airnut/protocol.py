@@ -0,0 +1,148 @@
+"""Frame codec and pre-encoded control frames for the Airnut 1S socket protocol."""
+import json
+import sys
+
+try:  # HA自带orjson，解析速度更快；独立运行时回退到标准库
+    import orjson
+except ImportError:
+    orjson = None
+
+FRAME_DELIMITER = b"\n\r"
+_WHITESPACE = b" \t\r\n"
+
+JSON_BACKEND = "orjson" if orjson else "json"
+_loads = orjson.loads if orjson else json.loads
+
+
+def _encode(command: dict) -> bytes:
+    """Serialize a control frame exactly as the device expects it."""
+    return json.dumps(command).encode("utf-8")
+
+
+# 控制帧在导入时序列化一次，之后每次连接/登录/轮询直接复用
+VOLUME_CMD = _encode({
+    "sendback_appserver": 100000007,
+    "param": {"volume": 0, "socket_id": 100000007, "check_key": "s_set_volume19085"},
+    "volume": 0,
+    "p": "set_volume",
+    "type": "control",
+    "check_key": "s_set_volume19085",
+})
+GET_CMD = _encode({
+    "sendback_appserver": 100000007,
+    "param": {"socket_id": 100000007, "type": 1, "check_key": "s_get19085"},
+    "p": "get",
+    "type": "control",
+    "check_key": "s_get19085",
+})
+LOGIN_RESP = _encode({"type": "client", "socket_id": 18567, "result": 0, "p": "log_in"})
+
+
+# 登录帧中可能携带设备标识的字段（不同固件版本字段名不一）
+_IDENTITY_KEYS = ("mac", "device_id", "deviceid", "sn", "id")
+
+
+class FrameTooLargeError(ValueError):
+    """Raised when a device sends more than max_frame_size bytes without a frame boundary.
+
+    ``frames`` holds the complete frames decoded from the same read before
+    the oversized one, so the caller can still handle them.
+    """
+
+    def __init__(self, max_frame_size: int, frames: list[dict] | None = None):
+        super().__init__(f"Frame exceeds {max_frame_size} bytes")
+        self.frames = frames or []
+
+
+class FrameDecoder:
+    """Per-connection stream decoder (按连接缓存未完成的数据帧).
+
+    Device frames are JSON objects separated by ``\\n\\r``. TCP may split one
+    frame across several reads or coalesce several frames into one read, so
+    bytes are accumulated in a bytearray and only complete frames are
+    decoded. A trailing frame without delimiter is accepted once it forms a
+    complete JSON object, which matches firmware that omits the delimiter on
+    the last frame of a burst. Frames that fail to decode are collected in
+    ``rejected`` for the caller to log.
+    """
+
+    __slots__ = ("_buffer", "_scan_from", "max_frame_size", "rejected")
+
+    def __init__(self, max_frame_size: int):
+        self._buffer = bytearray()
+        self._scan_from = 0  # 已确认不含分隔符的前缀长度，避免重复扫描
+        self.max_frame_size = max_frame_size
+        self.rejected: list[bytes] = []
+
+    def __len__(self) -> int:
+        return len(self._buffer)
+
+    def feed(self, data: bytes) -> list[dict]:
+        """Append received bytes and return every complete decoded frame."""
+        buf = self._buffer
+        buf += data
+        messages: list[dict] = []
+        start = 0
+        # 分隔符可能跨两次读取，回退一个字节再查找
+        pos = buf.find(FRAME_DELIMITER, max(self._scan_from - 1, 0))
+        while pos != -1:
+            if pos - start > self.max_frame_size:
+                self.reset()
+                raise FrameTooLargeError(self.max_frame_size, messages)
+            frame = bytes(buf[start:pos]).strip(_WHITESPACE)
+            if frame:
+                try:
+                    messages.append(decode_frame(frame))
+                except ValueError:
+                    self.rejected.append(frame)
+            start = pos + len(FRAME_DELIMITER)
+            pos = buf.find(FRAME_DELIMITER, start)
+
+        if start:
+            del buf[:start]
+
+        tail = len(buf)
+        if tail > self.max_frame_size:
+            self.reset()
+            raise FrameTooLargeError(self.max_frame_size, messages)
+
+        # 无分隔符的尾帧：仅当它看起来是完整JSON对象时才尝试解析，失败则继续等待
+        if tail and buf[-1] == 0x7D:  # "}"
+            frame = bytes(buf).strip(_WHITESPACE)
+            if frame[:1] == b"{":
+                try:
+                    messages.append(decode_frame(frame))
+                except ValueError:
+                    pass
+                else:
+                    buf.clear()
+                    tail = 0
+        self._scan_from = tail
+        return messages
+
+    def reset(self) -> None:
+        """Drop any buffered partial frame."""
+        self._buffer.clear()
+        self._scan_from = 0
+
+
+def decode_frame(frame: bytes) -> dict:
+    """Decode one complete frame into a JSON object."""
+    return _loads(frame)
+
+
+def login_identity(frame: dict) -> str | None:
+    """Extract the device identity from a log_in frame.
+
+    Checks the top level and ``param`` for the first identity-like field.
+    Returns None when the firmware sends none; such connections are keyed
+    by socket only and never deduplicated.
+    """
+    for source in (frame, frame.get("param")):
+        if not isinstance(source, dict):
+            continue
+        for key in _IDENTITY_KEYS:
+            value = source.get(key)
+            if value not in (None, ""):
+                return sys.intern(str(value))
+    return None
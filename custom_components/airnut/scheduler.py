@@ -0,0 +1,212 @@
+"""Adaptive per-device poll scheduling for Airnut 1S."""
+import heapq
+import random
+import zlib
+from collections.abc import Callable, Hashable
+
+# 变化率阈值（每分钟），超过即收紧轮询间隔
+PM25_RATE_THRESHOLD = 5.0
+CO2_RATE_THRESHOLD = 50.0
+# 传感器噪声：两次读数之差在此范围内视为无变化（与默认状态写入死区一致）
+PM25_NOISE = 2.0
+CO2_NOISE = 20.0
+# 变化率低于阈值的该比例视为“平稳”，逐步放宽间隔
+FLAT_RATIO = 0.2
+TIGHTEN_FACTOR = 0.5
+RELAX_FACTOR = 1.5
+# 每次排期在间隔上叠加 ±JITTER_RATIO 的随机抖动，避免设备同时应答
+JITTER_RATIO = 0.1
+
+
+def phase_offset(phase_key: str, interval: float) -> float:
+    """Stable offset in [0, interval) derived from a device key."""
+    return zlib.crc32(phase_key.encode("utf-8")) / 0x100000000 * interval
+
+
+class _DeviceSchedule:
+    """Scheduling state of one device."""
+
+    __slots__ = ("interval", "due", "last_ts", "last_pm25", "last_co2")
+
+    def __init__(self, interval: float, due: float):
+        self.interval = interval
+        self.due = due
+        self.last_ts: float | None = None
+        self.last_pm25: float | None = None
+        self.last_co2: float | None = None
+
+
+class AdaptivePollScheduler:
+    """Keep a per-device next-due time in a heap and adapt each device's interval.
+
+    Devices start at a stable per-device phase offset within the base
+    interval, and every reschedule adds random jitter, so polls (and the
+    replies they trigger) spread across the interval instead of bursting.
+    A device whose PM2.5 or CO2 is changing quickly is polled more often, down
+    to min_interval; a device with flat readings, or any device at night,
+    drifts toward max_interval. Removed devices are dropped lazily when their
+    stale heap entry reaches the top.
+    """
+
+    def __init__(self, base_interval: float, min_interval: float, max_interval: float):
+        self.base_interval = base_interval
+        self.min_interval = min(min_interval, base_interval)
+        self.max_interval = max(max_interval, base_interval)
+        self._heap: list[tuple[float, int, Hashable]] = []
+        self._devices: dict[Hashable, _DeviceSchedule] = {}
+        self._seq = 0  # 相同到期时间时保持先进先出，且避免比较key
+
+    def __len__(self) -> int:
+        return len(self._devices)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._devices
+
+    def _push(self, key: Hashable, due: float) -> None:
+        self._seq += 1
+        heapq.heappush(self._heap, (due, self._seq, key))
+
+    def _jitter(self, interval: float) -> float:
+        return interval * random.uniform(-JITTER_RATIO, JITTER_RATIO)
+
+    def add(self, key: Hashable, now: float, phase_key: str) -> None:
+        """Start scheduling a device at its phase slot within the base interval.
+
+        The first poll is the next instant t > now with t % base_interval equal
+        to the device's phase offset, so a given phase_key always polls in the
+        same slot of the interval, across reconnects too.
+        """
+        offset = phase_offset(phase_key, self.base_interval)
+        wait = (offset - now) % self.base_interval or self.base_interval
+        entry = _DeviceSchedule(self.base_interval, now + wait)
+        self._devices[key] = entry
+        self._push(key, entry.due)
+
+    def remove(self, key: Hashable) -> None:
+        """Stop scheduling a device."""
+        self._devices.pop(key, None)
+
+    def interval(self, key: Hashable) -> float | None:
+        """Current poll interval of a device."""
+        entry = self._devices.get(key)
+        return entry.interval if entry else None
+
+    def observe(self, key: Hashable, timestamp: float, pm25: float, co2: float) -> None:
+        """Adapt a device's interval from the rate of change of a new reading.
+
+        The rate is measured against a reference reading at least
+        min_interval old, and changes within the sensor noise count as
+        zero, so closely spaced posts (handshake get plus first poll,
+        unsolicited posts) cannot tighten the interval on noise alone.
+        timestamp must come from the same clock as the now passed to pop_due.
+        """
+        entry = self._devices.get(key)
+        if entry is None:
+            return
+        if entry.last_ts is not None:
+            span = timestamp - entry.last_ts
+            if span < self.min_interval:
+                return  # 间隔太短，保留参考读数，等待足够的时间跨度
+            minutes = span / 60
+            pm25_rate = max(abs(pm25 - entry.last_pm25) - PM25_NOISE, 0) / minutes / PM25_RATE_THRESHOLD
+            co2_rate = max(abs(co2 - entry.last_co2) - CO2_NOISE, 0) / minutes / CO2_RATE_THRESHOLD
+            rate = max(pm25_rate, co2_rate)
+            if rate >= 1:
+                entry.interval = max(self.min_interval, entry.interval * TIGHTEN_FACTOR)
+            elif rate <= FLAT_RATIO:
+                entry.interval = min(self.max_interval, entry.interval * RELAX_FACTOR)
+            else:
+                # 中等变化：回归基础间隔
+                entry.interval = (entry.interval + self.base_interval) / 2
+            # 收紧后立即按新间隔重新排期，不必等到原定时间
+            if timestamp + entry.interval < entry.due:
+                entry.due = timestamp + entry.interval
+                self._push(key, entry.due)
+        entry.last_ts = timestamp
+        entry.last_pm25 = pm25
+        entry.last_co2 = co2
+
+    def next_due(self) -> float | None:
+        """Earliest due time across all devices, or None if none are scheduled."""
+        heap = self._heap
+        while heap:
+            due, _, key = heap[0]
+            entry = self._devices.get(key)
+            if entry is not None and entry.due == due:
+                return due
+            heapq.heappop(heap)  # 过期条目（设备已移除或已重新排期）
+        return None
+
+    def pop_due(
+        self, now: float, night: Callable[[Hashable], bool] | None = None
+    ) -> list[Hashable]:
+        """Return every device due at now and schedule its next poll.
+
+        night tells whether a device is in its night window; those relax.
+        """
+        due_keys: list[Hashable] = []
+        heap = self._heap
+        while heap and heap[0][0] <= now:
+            due, _, key = heapq.heappop(heap)
+            entry = self._devices.get(key)
+            if entry is None or entry.due != due:
+                continue
+            if night is not None and night(key):
+                entry.interval = min(self.max_interval, entry.interval * RELAX_FACTOR)
+            entry.due = now + entry.interval + self._jitter(entry.interval)
+            self._push(key, entry.due)
+            due_keys.append(key)
+        return due_keys
+
+
+class TimerWheel:
+    """Hashed timer wheel for connection expiry.
+
+    Keys live in one of ``slots`` buckets; adding, removing and re-arming a
+    key are O(1) dict operations, and each tick only visits the bucket under
+    the cursor. Delays longer than one revolution are handled with a
+    per-key rounds counter.
+    """
+
+    def __init__(self, tick: float, slots: int, now: float):
+        self.tick = tick
+        self.slots = slots
+        self._buckets: list[dict[Hashable, int]] = [{} for _ in range(slots)]
+        self._where: dict[Hashable, int] = {}  # key -> bucket index
+        self._cursor = 0
+        self._time = now  # 当前刻度的起始时间
+
+    def __len__(self) -> int:
+        return len(self._where)
+
+    def add(self, key: Hashable, delay: float) -> None:
+        """Arm (or re-arm) key to expire after delay seconds."""
+        self.remove(key)
+        ticks = max(1, -int(-delay // self.tick))  # 向上取整
+        slot = (self._cursor + ticks) % self.slots
+        self._buckets[slot][key] = (ticks - 1) // self.slots
+        self._where[key] = slot
+
+    def remove(self, key: Hashable) -> None:
+        """Disarm key if armed."""
+        slot = self._where.pop(key, None)
+        if slot is not None:
+            del self._buckets[slot][key]
+
+    def advance(self, now: float) -> list[Hashable]:
+        """Move the cursor up to now and return the keys that expired."""
+        expired: list[Hashable] = []
+        while self._time + self.tick <= now:
+            self._time += self.tick
+            self._cursor = (self._cursor + 1) % self.slots
+            bucket = self._buckets[self._cursor]
+            if not bucket:
+                continue
+            for key, rounds in list(bucket.items()):
+                if rounds:
+                    bucket[key] = rounds - 1
+                else:
+                    del bucket[key]
+                    del self._where[key]
+                    expired.append(key)
+        return expired
@@ -1,23 +1,35 @@
 """Airnut 1S 传感器平台（已修复夜间更新策略）"""
 import logging
-from datetime import datetime
 
-from homeassistant.components.sensor import SensorEntity, SensorEntityDescription
+from homeassistant.components.sensor import (
+    SensorDeviceClass,
+    SensorEntity,
+    SensorEntityDescription,
+    SensorStateClass,
+)
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.core import HomeAssistant
+from homeassistant.const import EntityCategory, UnitOfTime
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.dispatcher import async_dispatcher_connect
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
 from homeassistant.helpers.device_registry import DeviceInfo
-from homeassistant.util import dt as dt_util
 
+from . import entry_devices
 from .const import (
+    CONF_DEADBAND,
+    CONF_DEVICE_ID,
     CONF_IP,
+    CONF_MAX_SILENCE,
     CONF_SCAN_INTERVAL,
-    CONF_NIGHT_START,
-    CONF_NIGHT_END,
-    CONF_NIGHT_UPDATE,
+    DEFAULT_MAX_SILENCE,
     DOMAIN,
-    SENSOR_TYPES
+    SENSOR_TYPES,
+    SIGNAL_AVAILABILITY,
+    SIGNAL_DEVICE_UPDATE,
 )
+from .filters import DeadbandFilter
+from .history import HISTORY_WINDOWS
+from .socket_server import AirnutDeviceData
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -25,9 +37,9 @@ SENSOR_DESCRIPTIONS = [
     SensorEntityDescription(
         key=key,
         name=SENSOR_TYPES[key]["name"],
-        device_class=SENSOR_TYPES[key]["device_class"],
+        device_class=SensorDeviceClass(SENSOR_TYPES[key]["device_class"]),
         native_unit_of_measurement=SENSOR_TYPES[key]["native_unit_of_measurement"],
-        state_class=SENSOR_TYPES[key]["state_class"],
+        state_class=SensorStateClass(SENSOR_TYPES[key]["state_class"]),
     )
     for key in SENSOR_TYPES.keys()
 ]
@@ -42,16 +54,40 @@ async def async_setup_entry(
         return
 
     server = hass.data[DOMAIN]["server"]
-    device_ip = entry.data[CONF_IP]
 
-    entities = [
-        AirnutSensor(hass, entry, server, device_ip, desc)
-        for desc in SENSOR_DESCRIPTIONS
-    ]
-    async_add_entities(entities, update_before_add=True)
+    # 一个条目可包含多台设备（批量发现），全部实体一次性添加
+    entities = []
+    for device in entry_devices(entry):
+        device_id = device[CONF_DEVICE_ID]
+        device_ip = device[CONF_IP]
+        entities.extend(
+            AirnutSensor(hass, entry, server, device_ip, desc, device_id)
+            for desc in SENSOR_DESCRIPTIONS
+        )
+        entities.append(AirnutPollRttSensor(entry, server, device_ip, device_id))
+    async_add_entities(entities)
+
+
+def _device_key(device_ip: str, device_id: str | None) -> str:
+    """Unique id prefix: the login identity for discovered devices, the IP for manual ones."""
+    return f"airnut_{device_id or device_ip}"
+
+
+def _server_key(server, device_ip: str, device_id: str | None) -> str:
+    """Key of the device's data on the server.
+
+    Discovered devices use their login identity; manually added ones use
+    the key of the device that last reported from their IP.
+    """
+    return device_id or server.device_key(device_ip)
 
 
 class AirnutSensor(SensorEntity):
+    # 短期趋势属性只用于展示，不写入recorder
+    _unrecorded_attributes = frozenset(
+        f"{stat}_{window}" for window in HISTORY_WINDOWS for stat in ("min", "max", "mean")
+    ) | {"suppressed_writes", "last_update", "stale", "history_span"}
+
     def __init__(
         self,
         hass: HomeAssistant,
@@ -59,63 +95,148 @@ class AirnutSensor(SensorEntity):
         server,
         device_ip: str,
         description: SensorEntityDescription,
+        device_id: str | None = None,
     ):
         self.hass = hass
         self._entry = entry
         self._server = server
+        # 服务端按设备键（登录标识，否则IP）保存数据，IP变化后无需重新加载条目；
+        # 手动添加的设备只有IP，每次按该IP查得当前的设备键
         self._device_ip = device_ip
+        self._device_id = device_id
         self.entity_description = description
 
-        self._attr_unique_id = f"airnut_{device_ip}_{description.key}"
-        self._attr_should_poll = True
-        self._attr_available = True
+        self._attr_unique_id = f"{_device_key(device_ip, device_id)}_{description.key}"
+        self._attr_should_poll = False  # 由服务端推送数据，实体不再轮询
+        self._attr_available = server.is_available(_server_key(server, device_ip, device_id))
         self._attr_native_value = None
 
         self._attr_device_info = DeviceInfo(
-            identifiers={(DOMAIN, f"airnut_{device_ip}" )},
+            identifiers={(DOMAIN, _device_key(device_ip, device_id))},
             name=f"Airnut 1S ({device_ip})",
             manufacturer="Airnut",
             model="1S",
         )
 
-        # 读取夜间配置
-        self._night_update = entry.options.get(CONF_NIGHT_UPDATE, entry.data.get(CONF_NIGHT_UPDATE, True))
-        self._night_start = entry.options.get(CONF_NIGHT_START, entry.data.get(CONF_NIGHT_START, "23:00"))
-        self._night_end = entry.options.get(CONF_NIGHT_END, entry.data.get(CONF_NIGHT_END, "06:00"))
+        # 死区过滤：变化太小且未到心跳时间的读数不写入状态机
+        self._filter = DeadbandFilter(
+            entry.options.get(CONF_DEADBAND.format(description.key), SENSOR_TYPES[description.key]["deadband"]),
+            entry.options.get(CONF_MAX_SILENCE, DEFAULT_MAX_SILENCE),
+        )
+
+    @property
+    def _key(self) -> str:
+        return _server_key(self._server, self._device_ip, self._device_id)
 
     @property
-    def _is_night_time(self):
-        """判断当前是否在夜间时段"""
-        now = dt_util.now().time()
-        try:
-            night_start = datetime.strptime(self._night_start, "%H:%M").time()
-            night_end = datetime.strptime(self._night_end, "%H:%M").time()
-        except:
-            return False
-
-        if night_start <= night_end:
-            return night_start <= now <= night_end
-        else:
-            return now >= night_start or now <= night_end
-
-    async def async_update(self):
+    def extra_state_attributes(self) -> dict:
+        """Rolling min/max/mean over the 5m, 1h and 24h windows, plus freshness and filter counters."""
+        attributes = {"suppressed_writes": self._filter.suppressed}
+        key = self._key
+        data = self._server.get_device_data(key)
+        if data and data.last_update:
+            # 重启后由快照恢复的读数标记为stale，而不是显示为不可用
+            attributes["last_update"] = data.last_update.isoformat()
+            attributes["stale"] = self._server.is_stale(key)
+        history = self._server.get_device_history(key)
+        if history:
+            # 实际覆盖的历史时长（秒），超过该时长的窗口不会输出
+            attributes["history_span"] = round(history.span())
+            attributes.update(history.summary(self.entity_description.key))
+        return attributes
+
+    async def async_added_to_hass(self) -> None:
+        """Subscribe to readings pushed by the socket server."""
+        await super().async_added_to_hass()
+        # 手动添加的设备按IP订阅（读数同时按上报IP分发）
+        signal = SIGNAL_DEVICE_UPDATE.format(self._device_id or self._device_ip)
+        self.async_on_remove(async_dispatcher_connect(self.hass, signal, self._handle_update))
+        self.async_on_remove(
+            async_dispatcher_connect(self.hass, SIGNAL_AVAILABILITY, self._handle_availability)
+        )
+        # 用服务端已缓存的最新数据初始化
+        data = self._server.get_device_data(self._key)
+        if data and self._filter.should_write(getattr(data, self.entity_description.key)):
+            self._update_value(data)
+
+    @callback
+    def _handle_availability(self) -> None:
+        """Mark the sensor unavailable once its data is older than the idle timeout."""
+        available = self._server.is_available(self._key)
+        if available != self._attr_available:
+            self._attr_available = available
+            self.async_write_ha_state()
+
+    @callback
+    def _handle_update(self, data: AirnutDeviceData) -> None:
+        """Handle this device's reading from a batch pushed by the socket server."""
+        if not self._attr_available:
+            self._attr_available = True
+            self.async_write_ha_state()
         # ====================== 夜间策略核心 ======================
-        if not self._night_update and self._is_night_time:
+        # 与服务端轮询共用同一份夜间/免打扰状态（按本条目的夜间设置）
+        if self._server.is_suppressed(self._key):
             _LOGGER.debug("夜间模式：跳过更新 %s", self.name)
             return
         # ==========================================================
-
-        await self._server.update_device_data()
-        data = self._server.get_device_data(self._device_ip)
-        if not data:
+        if not self._filter.should_write(getattr(data, self.entity_description.key)):
             return
+        self._update_value(data)
+        self.async_write_ha_state()
+
+    def _update_value(self, data: AirnutDeviceData) -> None:
+        """Copy this sensor's field from a device reading."""
+        self._attr_native_value = getattr(data, self.entity_description.key)
+
+
+class AirnutPollRttSensor(SensorEntity):
+    """Debug sensor: poll round-trip time of one device (默认禁用).
+
+    The state is the time from the last get sent to the post received; the
+    attributes carry the device's connection counters, so network, device
+    and event-loop delays can be told apart together with the diagnostics.
+    """
+
+    _attr_should_poll = False
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+    _attr_entity_registry_enabled_default = False
+    _attr_device_class = SensorDeviceClass.DURATION
+    _attr_state_class = SensorStateClass.MEASUREMENT
+    _attr_native_unit_of_measurement = UnitOfTime.MILLISECONDS
+    # 名称挂在设备名之下（如 "Airnut 1S (192.168.1.20) Poll round-trip"），多台设备不会重名
+    _attr_has_entity_name = True
+    _attr_name = "Poll round-trip"
+    _unrecorded_attributes = frozenset({"connections", "disconnects", "reconnects", "frames", "last_rtt_ms"})
+
+    def __init__(self, entry: ConfigEntry, server, device_ip: str, device_id: str | None = None):
+        self._server = server
+        self._device_ip = device_ip
+        self._device_id = device_id
+        self._attr_unique_id = f"{_device_key(device_ip, device_id)}_poll_rtt"
+        self._attr_device_info = DeviceInfo(
+            identifiers={(DOMAIN, _device_key(device_ip, device_id))},
+            name=f"Airnut 1S ({device_ip})",
+            manufacturer="Airnut",
+            model="1S",
+        )
 
-        key = self.entity_description.key
-        if key == "temperature":
-            self._attr_native_value = data.temperature
-        elif key == "humidity":
-            self._attr_native_value = data.humidity
-        elif key == "pm25":
-            self._attr_native_value = data.pm25
-        elif key == "co2":
-            self._attr_native_value = data.co2
\ No newline at end of file
+    @property
+    def _key(self) -> str:
+        return _server_key(self._server, self._device_ip, self._device_id)
+
+    @property
+    def extra_state_attributes(self) -> dict:
+        return self._server.metrics.device(self._key).as_dict()
+
+    async def async_added_to_hass(self) -> None:
+        """Refresh whenever the device reports."""
+        await super().async_added_to_hass()
+        # 手动添加的设备按IP订阅（读数同时按上报IP分发）
+        signal = SIGNAL_DEVICE_UPDATE.format(self._device_id or self._device_ip)
+        self.async_on_remove(async_dispatcher_connect(self.hass, signal, self._handle_update))
+
+    @callback
+    def _handle_update(self, _data: AirnutDeviceData) -> None:
+        rtt = self._server.metrics.device(self._key).last_rtt
+        self._attr_native_value = None if rtt is None else round(rtt * 1000, 1)
+        self.async_write_ha_state()
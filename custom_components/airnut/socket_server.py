@@ -1,79 +1,280 @@
-"""Asynchronous Socket Server for Airnut 1S."""
+"""Asynchronous Socket Server for Airnut 1S.
+
+This module does not import Home Assistant; the integration wires it to HA
+in __init__.py, and ``python -m custom_components.airnut`` runs it headless.
+"""
 import asyncio
-import json
+import functools
+import itertools
 import logging
 import socket  # 新增：导入socket模块
+import sys
+from collections import deque
+from collections.abc import Callable
 from dataclasses import dataclass
-from datetime import datetime, time
-
-from homeassistant.core import HomeAssistant
+from datetime import datetime
+from time import monotonic as time_monotonic, perf_counter, time as wall_clock
 
+from .capture import KIND_CLOSE, KIND_IN, KIND_OPEN, KIND_OUT, CaptureWriter
 from .const import (
-    CONF_NIGHT_END,
-    CONF_NIGHT_START,
-    CONF_NIGHT_UPDATE,
+    CAPTURE_BACKUPS,
+    CAPTURE_MAX_BYTES,
+    CAPTURE_QUEUE_SIZE,
+    CONF_BUFFER_SIZE,
+    CONF_CAPTURE_PATH,
+    CONF_HOST,
+    CONF_HISTORY_SIZE,
+    CONF_IDLE_TIMEOUT,
+    CONF_LISTENERS,
+    CONF_MAX_CONNECTIONS,
+    CONF_PORT,
+    CONF_PUBLISH_WINDOW,
     CONF_SCAN_INTERVAL,
-    DEFAULT_NIGHT_END,
-    DEFAULT_NIGHT_START,
-    DEFAULT_NIGHT_UPDATE,
+    CONF_WORKERS,
+    DEFAULT_HISTORY_SIZE,
+    DEFAULT_MAX_CONNECTIONS,
+    DEFAULT_PUBLISH_WINDOW,
     DEFAULT_SCAN_INTERVAL,
+    DEFAULT_WORKERS,
+    IDLE_TIMEOUT_FACTOR,
+    KEEPALIVE_COUNT,
+    KEEPALIVE_IDLE,
+    KEEPALIVE_INTERVAL,
+    MAX_FRAME_SIZE,
+    OUTBOX_SIZE,
+    POLL_DRAIN_TIMEOUT,
+    POLL_INTERVAL_MAX_FACTOR,
+    POLL_INTERVAL_MIN,
+    REAPER_SLOTS,
+    REAPER_TICK,
     SOCKET_BUFFER_SIZE,
     SOCKET_HOST,
     SOCKET_PORT,
 )
+from .history import DeviceHistory
+from .longterm import HourlyAggregator, HourlyStat
+from .night import NightSchedule
+from .metrics import ListenerCounters, ServerMetrics
+from .protocol import (
+    GET_CMD,
+    LOGIN_RESP,
+    VOLUME_CMD,
+    FrameDecoder,
+    FrameTooLargeError,
+    login_identity,
+)
+from .scheduler import AdaptivePollScheduler, TimerWheel
+from .workers import WorkerPool
 
 _LOGGER = logging.getLogger(__name__)
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class AirnutDeviceData:
-    """Dataclass for Airnut device data."""
+    """One immutable reading of an Airnut device.
+
+    timestamp is time.monotonic() at receipt, so ages are immune to wall
+    clock jumps; wall_time()/last_update convert it for display and storage.
+    """
     temperature: float | None = None
     humidity: float | None = None
     pm25: int | None = None
     co2: int | None = None
-    last_update: datetime | None = None
+    timestamp: float | None = None
 
-class AirnutAsyncSocketServer:
-    """Asynchronous Socket Server to communicate with Airnut 1S devices."""
+    def wall_time(self) -> float | None:
+        """Receipt time as a Unix timestamp."""
+        if self.timestamp is None:
+            return None
+        return self.timestamp + (wall_clock() - time_monotonic())
+
+    @property
+    def last_update(self) -> datetime | None:
+        """Receipt time as a local datetime."""
+        wall = self.wall_time()
+        return None if wall is None else datetime.fromtimestamp(wall)
+
+@dataclass(frozen=True, slots=True)
+class ListenerConfig:
+    """One listen endpoint (每个VLAN/网卡可配置独立的监听端点)."""
+    host: str = SOCKET_HOST
+    port: int = SOCKET_PORT
+    buffer_size: int = SOCKET_BUFFER_SIZE  # 每次read的字节数
+    max_connections: int = DEFAULT_MAX_CONNECTIONS  # 0 = 不限
+
+    @property
+    def name(self) -> str:
+        return f"{self.host}:{self.port}"
+
+
+def listener_configs(config: dict) -> list[ListenerConfig]:
+    """Listen endpoints from a server config; one default endpoint if none are given."""
+    return [
+        ListenerConfig(
+            host=entry.get(CONF_HOST, SOCKET_HOST),
+            port=int(entry.get(CONF_PORT, SOCKET_PORT)),
+            buffer_size=int(entry.get(CONF_BUFFER_SIZE, SOCKET_BUFFER_SIZE)),
+            max_connections=int(entry.get(CONF_MAX_CONNECTIONS, DEFAULT_MAX_CONNECTIONS)),
+        )
+        for entry in config.get(CONF_LISTENERS) or [{}]
+    ]
+
+
+class _Listener:
+    """A bound listen endpoint and its live connection count."""
+
+    __slots__ = ("config", "server", "counters")
+
+    def __init__(self, config: ListenerConfig, counters: ListenerCounters):
+        self.config = config
+        self.server: asyncio.Server | None = None
+        self.counters = counters
+
+
+class AirnutConnection:
+    """One device socket (每个TCP连接一个对象，持有writer/对端地址/设备标识)."""
+
+    __slots__ = (
+        "writer", "peer", "ip", "device_id", "logged_in", "last_seen", "decoder", "get_queued_at", "get_sent_at",
+        "outbox", "outbox_ready", "writer_task", "serial", "listener",
+    )
+
+    def __init__(self, writer: asyncio.StreamWriter, peer: tuple, listener: _Listener | None = None):
+        self.writer = writer
+        self.peer = peer
+        self.ip: str = sys.intern(peer[0])  # 作为各索引的键，驻留后字典查找只比较指针
+        self.device_id: str | None = None  # 登录帧中的设备标识，登录前为None
+        self.logged_in = False
+        self.last_seen = time_monotonic()
+        self.decoder = FrameDecoder(MAX_FRAME_SIZE)
+        self.get_queued_at: float | None = None  # 最近一次get的入队时间，用于统计投递耗时
+        self.get_sent_at: float | None = None  # 最近一次get的发送时间，用于计算往返耗时
+        # 待发送命令，由该连接唯一的写协程按顺序写出
+        self.outbox: deque[bytes] = deque()
+        self.outbox_ready = asyncio.Event()
+        self.writer_task: asyncio.Task | None = None
+        self.serial = 0  # 连接序号，用于在抓包中区分连接
+        self.listener = listener  # 接受该连接的监听端点
+
+    def __repr__(self) -> str:
+        return f"<AirnutConnection {self.device_id or '?'} {self.peer[0]}:{self.peer[1]}>"
+
+    @property
+    def key(self) -> str:
+        """Key of the device's data, history and counters: its login identity, else its IP.
 
-    _instance = None  # 新增：单例模式，确保只启动一个服务
-    _lock = asyncio.Lock()
+        同一NAT后的多台设备共用一个IP，DHCP也可能把离线设备的IP分给其他设备，
+        因此有登录标识时不按IP区分设备。
+        """
+        return self.device_id or self.ip
 
-    def __new__(cls, *args, **kwargs):
-        """单例模式：确保全局只有一个Socket服务实例"""
-        if cls._instance is None:
-            cls._instance = super().__new__(cls)
-        return cls._instance
+    def abort(self) -> None:
+        """Drop the socket immediately; _handle_client reaps it on EOF."""
+        self.writer.transport.abort()
 
-    def __init__(self, hass: HomeAssistant, config: dict):
-        self.hass = hass
+
+class AirnutAsyncSocketServer:
+    """Asynchronous Socket Server to communicate with Airnut 1S devices.
+
+    Instances are independent; use ServerRegistry (SERVERS) to share one
+    running server per name instead of binding its ports twice.
+    """
+
+    def __init__(self, config: dict, clock: Callable[[], datetime] = datetime.now):
         self.config = config
-        self._server: asyncio.Server | None = None
-        self._clients: dict[asyncio.StreamWriter, str] = {}  # writer -> device IP
-        self._device_data: dict[str, AirnutDeviceData] = {}  # device IP -> data
-        self._last_scan: datetime = datetime.min
+        self._lock = asyncio.Lock()
+        self._bound: dict[str, _Listener] = {}  # "host:port" -> 已绑定的监听端点
+        self._clients: dict[asyncio.StreamWriter, AirnutConnection] = {}  # writer -> connection
+        self._devices: dict[str, AirnutConnection] = {}  # device id -> connection
+        self._device_data: dict[str, AirnutDeviceData] = {}  # device key -> data
+        self._history: dict[str, DeviceHistory] = {}  # device key -> history
+        # 设备键与最近上报IP的双向索引，供按IP手动添加的设备及免打扰时段使用
+        self._addresses: dict[str, str] = {}  # device key -> IP
+        self._ip_keys: dict[str, str] = {}  # IP -> 最近从该IP上报的设备键
+        self._history_size = config.get(CONF_HISTORY_SIZE, DEFAULT_HISTORY_SIZE)
+        self._hourly = HourlyAggregator()  # 长期统计的小时桶
         self._scan_interval = config.get(CONF_SCAN_INTERVAL, DEFAULT_SCAN_INTERVAL)
-        self._night_start = self._parse_time(config.get(CONF_NIGHT_START, DEFAULT_NIGHT_START))
-        self._night_end = self._parse_time(config.get(CONF_NIGHT_END, DEFAULT_NIGHT_END))
-        self._night_update = config.get(CONF_NIGHT_UPDATE, DEFAULT_NIGHT_UPDATE)
+        self._scheduler = AdaptivePollScheduler(
+            self._scan_interval,
+            POLL_INTERVAL_MIN,
+            self._scan_interval * POLL_INTERVAL_MAX_FACTOR,
+        )
+        self._schedule_changed = asyncio.Event()
+        self._reaper = TimerWheel(REAPER_TICK, REAPER_SLOTS, time_monotonic())
+        self._reaper_task: asyncio.Task | None = None
+        # 到达分布窗口取一个扫描周期，用于观察错峰效果
+        self.metrics = ServerMetrics(max(int(self._scan_interval), 60))
         self._is_running = False  # 新增：标记服务是否运行
+        self._poll_task: asyncio.Task | None = None
+        self._workers = config.get(CONF_WORKERS, DEFAULT_WORKERS)
+        self._pool: WorkerPool | None = None
+        self._capture_path = config.get(CONF_CAPTURE_PATH)
+        self._capture: CaptureWriter | None = None
+        self._serials = itertools.count(1)
+        self._listeners: list[Callable[[dict[str, AirnutDeviceData]], None]] = []
+        self._pending: dict[str, AirnutDeviceData] = {}  # device key -> 待发布的最新读数
+        self._publish_handle: asyncio.TimerHandle | None = None
+        # 夜间/免打扰时段的唯一判定来源，轮询与实体共用；配置条目可为其设备设置各自的夜间时段
+        self.night = NightSchedule(config, clock)
+        self._apply_config(config)
 
-    @staticmethod
-    def _parse_time(time_str: str) -> time:
-        """Parse time string (HH:MM) to time object."""
-        try:
-            return datetime.strptime(time_str, "%H:%M").time()
-        except ValueError:
-            _LOGGER.warning("Invalid time format %s, using default", time_str)
-            return datetime.strptime(DEFAULT_NIGHT_START, "%H:%M").time()
-
-    def _is_night_time(self) -> bool:
-        """Check if current time is in night period."""
-        now = datetime.now().time()
-        if self._night_start < self._night_end:
-            return self._night_start <= now <= self._night_end
-        # Handle overnight (e.g. 23:00 to 06:00)
-        return now >= self._night_start or now <= self._night_end
+    def _apply_config(self, config: dict) -> None:
+        """Apply the settings that can change while running (可热更新的配置)."""
+        self.config = config
+        self._listener_configs = listener_configs(config)
+        self._idle_timeout = config.get(
+            CONF_IDLE_TIMEOUT, self._scan_interval * POLL_INTERVAL_MAX_FACTOR * IDLE_TIMEOUT_FACTOR
+        )
+        self.night.configure(config)
+        self._publish_window = config.get(CONF_PUBLISH_WINDOW, DEFAULT_PUBLISH_WINDOW) / 1000
+
+    def add_listener(
+        self, listener: Callable[[dict[str, AirnutDeviceData]], None]
+    ) -> Callable[[], None]:
+        """Register a callback for batches of parsed readings; returns a remover.
+
+        A batch maps device key (AirnutConnection.key) to its latest reading
+        within the publish window.
+        """
+        self._listeners.append(listener)
+
+        def remove_listener() -> None:
+            if listener in self._listeners:
+                self._listeners.remove(listener)
+
+        return remove_listener
+
+    async def _poll_loop(self):
+        """Poll devices as they fall due (服务端统一轮询，实体不再各自轮询)."""
+        while True:
+            try:
+                await self.update_device_data()
+            except Exception as e:
+                _LOGGER.error("Error polling Airnut devices: %s", e)
+            # 睡到最近一个设备到期，或有新设备加入/间隔被收紧时提前唤醒
+            next_due = self._scheduler.next_due()
+            timeout = self._scan_interval if next_due is None else max(next_due - time_monotonic(), 0)
+            self._schedule_changed.clear()
+            try:
+                await asyncio.wait_for(self._schedule_changed.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _reap_loop(self):
+        """Expire connections that have been silent for idle_timeout (时间轮回收空闲连接)."""
+        while True:
+            await asyncio.sleep(REAPER_TICK)
+            now = time_monotonic()
+            for conn in self._reaper.advance(now):
+                if conn.writer not in self._clients:
+                    continue
+                idle = now - conn.last_seen
+                # 读取路径只更新last_seen，到期时再按剩余时间重新挂入时间轮；
+                # 夜间暂停轮询时设备本就静默，交给TCP keepalive检测死连接
+                if idle < self._idle_timeout or self.night.suppressed(conn.ip, conn.device_id):
+                    self._reaper.add(conn, max(self._idle_timeout - idle, REAPER_TICK))
+                    continue
+                _LOGGER.info("Closing idle connection %s (silent for %.0fs)", conn, idle)
+                conn.abort()
 
     async def start(self):
         """Start the async socket server (增加端口复用+避免重复启动)"""
@@ -82,28 +283,137 @@ class AirnutAsyncSocketServer:
                 _LOGGER.info("Socket server is already running, skip start")
                 return
 
-            try:
-                # 新增：创建socket并设置端口复用（核心修复端口占用）
-                sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-                sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
-                sock.bind((SOCKET_HOST, SOCKET_PORT))
-                sock.setblocking(False)
-
-                # 使用自定义socket启动server，而非直接绑定端口
-                self._server = await asyncio.start_server(
-                    self._handle_client,
-                    sock=sock  # 传入已配置的socket
-                )
+            self.night.start()
+            if self._workers:
+                # 多进程模式：本进程不监听端口，只汇总子进程转发的读数
+                self._pool = WorkerPool(self.config, self._workers, self._ingest)
+                await self._pool.start()
                 self._is_running = True
-                _LOGGER.info("Airnut socket server started on %s:%s (port reuse enabled)", SOCKET_HOST, SOCKET_PORT)
-            except OSError as e:
-                _LOGGER.error("Failed to start socket server: %s", e)
-                # 新增：释放socket资源
-                if 'sock' in locals():
-                    sock.close()
+                return
+
+            try:
+                for listener_config in self._listener_configs:
+                    self._bound[listener_config.name] = await self._bind(listener_config)
+            except OSError:
+                for listener in self._bound.values():
+                    listener.server.close()
+                self._bound.clear()
+                self.night.stop()
                 raise
 
+            if self._capture_path:
+                # 文件的打开、写入与轮转都在后台线程中进行
+                self._capture = CaptureWriter(
+                    self._capture_path, CAPTURE_MAX_BYTES, CAPTURE_BACKUPS, CAPTURE_QUEUE_SIZE
+                )
+                _LOGGER.warning("Capturing device traffic to %s", self._capture_path)
+            self._is_running = True
+            self._poll_task = asyncio.create_task(self._poll_loop())
+            self._reaper_task = asyncio.create_task(self._reap_loop())
+
+    async def _bind(self, config: ListenerConfig) -> _Listener:
+        """Bind and start one listen endpoint (增加端口复用)."""
+        listener = _Listener(config, self.metrics.listener(config.name))
+        try:
+            # 新增：创建socket并设置端口复用（核心修复端口占用）
+            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+            self._set_keepalive(sock)
+            sock.bind((config.host, config.port))
+            sock.setblocking(False)
+
+            # 使用自定义socket启动server，而非直接绑定端口
+            listener.server = await asyncio.start_server(
+                functools.partial(self._handle_client, listener),
+                sock=sock  # 传入已配置的socket
+            )
+        except OSError as e:
+            _LOGGER.error("Failed to start socket server on %s: %s", config.name, e)
+            # 新增：释放socket资源
+            if 'sock' in locals():
+                sock.close()
+            raise
+        _LOGGER.info("Airnut socket server listening on %s (port reuse enabled)", config.name)
+        return listener
+
+    async def _unbind(self, listener: _Listener) -> None:
+        """Stop one listen endpoint and drop the connections it accepted."""
+        listener.server.close()
+        for conn in list(self._clients.values()):
+            if conn.listener is listener:
+                conn.abort()
+        await listener.server.wait_closed()
+        _LOGGER.info("Airnut socket server stopped listening on %s", listener.config.name)
+
+    async def reconfigure(self, config: dict) -> None:
+        """Apply a new config without dropping unaffected connections.
+
+        Listen endpoints are diffed by host:port: new ones are bound,
+        removed ones are closed along with their connections, and buffer
+        sizes and connection limits of kept ones change in place. Night
+        settings, idle_timeout and publish_window take effect immediately;
+        scan_interval, history_size, capture_path and switching between
+        in-process and worker mode need a restart; a warning is logged when
+        one of them changes. In worker mode the workers are restarted with
+        the new config and worker count.
+        """
+        async with self._lock:
+            workers = config.get(CONF_WORKERS, DEFAULT_WORKERS)
+            self._warn_restart_needed(config, workers)
+            self._apply_config(config)
+            if not self._is_running:
+                return
+            if self._pool:
+                if workers:
+                    self._workers = workers
+                await self._pool.stop()
+                self._pool = WorkerPool(config, self._workers, self._ingest)
+                await self._pool.start()
+                return
+            wanted = {listener.name: listener for listener in self._listener_configs}
+            for name, listener in list(self._bound.items()):
+                listener_config = wanted.pop(name, None)
+                if listener_config is None:
+                    del self._bound[name]
+                    await self._unbind(listener)
+                else:
+                    listener.config = listener_config
+            for name, listener_config in wanted.items():
+                self._bound[name] = await self._bind(listener_config)
+
+    def _warn_restart_needed(self, config: dict, workers: int) -> None:
+        """Log the changed settings that only take effect after a restart."""
+        changed = [
+            key
+            for key, old, new in (
+                (CONF_SCAN_INTERVAL, self._scan_interval, config.get(CONF_SCAN_INTERVAL, DEFAULT_SCAN_INTERVAL)),
+                (CONF_HISTORY_SIZE, self._history_size, config.get(CONF_HISTORY_SIZE, DEFAULT_HISTORY_SIZE)),
+                (CONF_CAPTURE_PATH, self._capture_path, config.get(CONF_CAPTURE_PATH)),
+                # 子进程数可就地调整，但进程内与多进程模式之间的切换需要重启
+                (CONF_WORKERS, bool(self._workers), bool(workers)),
+            )
+            if old != new
+        ]
+        if changed:
+            _LOGGER.warning(
+                "Changed settings %s need a restart to take effect",
+                ", ".join(changed),
+            )
+
+    @staticmethod
+    def _set_keepalive(sock: socket.socket) -> None:
+        """Enable TCP keepalive; accepted sockets inherit it from the listener on Linux."""
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        # 以下选项并非所有平台都支持
+        for option, value in (
+            ("TCP_KEEPIDLE", KEEPALIVE_IDLE),
+            ("TCP_KEEPINTVL", KEEPALIVE_INTERVAL),
+            ("TCP_KEEPCNT", KEEPALIVE_COUNT),
+        ):
+            if hasattr(socket, option):
+                sock.setsockopt(socket.IPPROTO_TCP, getattr(socket, option), value)
+
     async def stop(self):
         """Stop the server and close all client connections (完善停止逻辑)"""
         async with self._lock:
@@ -111,11 +421,24 @@ class AirnutAsyncSocketServer:
                 _LOGGER.info("Socket server is not running, skip stop")
                 return
 
-            # 1. 关闭server
-            if self._server:
-                self._server.close()
-                await self._server.wait_closed()
-                self._server = None
+            # 1. 停止轮询并关闭server
+            if self._pool:
+                await self._pool.stop()
+                self._pool = None
+            for task in (self._poll_task, self._reaper_task):
+                if task:
+                    task.cancel()
+            self._poll_task = self._reaper_task = None
+            self.night.stop()
+            if self._publish_handle:
+                self._publish_handle.cancel()
+                self._publish_handle = None
+            self._pending.clear()
+            for listener in self._bound.values():
+                listener.server.close()
+            for listener in self._bound.values():
+                await listener.server.wait_closed()
+            self._bound.clear()
 
             # 2. 关闭所有客户端连接（强制关闭）
             for writer in list(self._clients.keys()):
@@ -125,126 +448,479 @@ class AirnutAsyncSocketServer:
                 except Exception as e:
                     _LOGGER.warning("Failed to close client connection: %s", e)
                 finally:
-                    if writer in self._clients:
-                        del self._clients[writer]
+                    self._clients.pop(writer, None)
+            self._devices.clear()
+            if self._capture:
+                await asyncio.get_running_loop().run_in_executor(None, self._capture.close)
+                self._capture = None
 
             # 3. 清空数据+标记服务停止
             self._device_data.clear()
+            self._history.clear()
+            self._addresses.clear()
+            self._ip_keys.clear()
             self._is_running = False
             _LOGGER.info("Socket server stopped (port released)")
 
     async def _handle_client(
-        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+        self, listener: _Listener, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
     ):
         """Handle new client connection (Airnut device)."""
-        client_ip = writer.get_extra_info("peername")[0]
-        self._clients[writer] = client_ip
+        counters = listener.counters
+        limit = listener.config.max_connections
+        if limit and counters.active >= limit:
+            counters.rejected += 1
+            _LOGGER.warning(
+                "Rejecting %s: %s already has %d connections",
+                writer.get_extra_info("peername"), listener.config.name, limit,
+            )
+            writer.transport.abort()
+            return
+        counters.accepted += 1
+        counters.active += 1
+        conn = AirnutConnection(writer, writer.get_extra_info("peername"), listener)
+        conn.serial = next(self._serials)
+        if self._capture:
+            self._capture.write(conn.serial, KIND_OPEN, f"{conn.ip}:{conn.peer[1]}".encode())
+        client_ip = conn.ip
+        self._clients[writer] = conn
+        self._scheduler.add(conn, time_monotonic(), client_ip)
+        self._reaper.add(conn, self._idle_timeout)
+        self._schedule_changed.set()
+        conn.writer_task = asyncio.create_task(self._write_loop(conn))
         _LOGGER.info("Airnut device connected: %s", client_ip)
 
         # Initial handshake with device
-        await self._send_initial_commands(writer)
+        self._send_initial_commands(conn)
 
         try:
             while True:
-                data = await reader.read(SOCKET_BUFFER_SIZE)
+                data = await reader.read(listener.config.buffer_size)
                 if not data:
                     break
-                await self._parse_device_data(client_ip, data)
+                if self._capture:
+                    self._capture.write(conn.serial, KIND_IN, data)
+                conn.last_seen = time_monotonic()
+                self.metrics.bytes += len(data)
+                counters.bytes += len(data)
+                self._parse_device_data(conn, data)
+        except FrameTooLargeError as e:
+            self.metrics.parse_errors += 1
+            _LOGGER.warning("Dropping client %s: %s", client_ip, e)
         except asyncio.IncompleteReadError:
             _LOGGER.debug("Client %s disconnected", client_ip)
         except Exception as e:
             _LOGGER.error("Error handling client %s: %s", client_ip, e)
         finally:
-            del self._clients[writer]
+            if conn.logged_in:
+                self.metrics.disconnected(conn.key)
+            counters.active -= 1
+            if self._capture:
+                self._capture.write(conn.serial, KIND_CLOSE)
+            conn.writer_task.cancel()
+            self._clients.pop(writer, None)
+            self._scheduler.remove(conn)
+            self._reaper.remove(conn)
+            # 仅当索引仍指向本连接时才移除（可能已被新连接替换）
+            if conn.device_id and self._devices.get(conn.device_id) is conn:
+                del self._devices[conn.device_id]
             writer.close()
             await writer.wait_closed()
 
-    async def _send_initial_commands(self, writer: asyncio.StreamWriter):
-        """Send initial handshake commands to Airnut device."""
-        volume_cmd = {
-            "sendback_appserver": 100000007,
-            "param": {"volume": 0, "socket_id": 100000007, "check_key": "s_set_volume19085"},
-            "volume": 0,
-            "p": "set_volume",
-            "type": "control",
-            "check_key": "s_set_volume19085",
-        }
-        get_cmd = {
-            "sendback_appserver": 100000007,
-            "param": {"socket_id": 100000007, "type": 1, "check_key": "s_get19085"},
-            "p": "get",
-            "type": "control",
-            "check_key": "s_get19085",
-        }
+    def _send_initial_commands(self, conn: AirnutConnection):
+        """Queue initial handshake commands to Airnut device."""
+        self._send(conn, VOLUME_CMD)
+        self._send(conn, GET_CMD)
+
+    def _send(self, conn: AirnutConnection, payload: bytes) -> bool:
+        """Queue payload for the connection's writer task.
 
+        A get still waiting in the queue absorbs a new one. Returns False if
+        the queue overflowed, in which case the connection is closed: the
+        device has stopped reading and would only fall further behind.
+        """
+        outbox = conn.outbox
+        if payload is GET_CMD and GET_CMD in outbox:
+            self.metrics.coalesced += 1
+            return True
+        if len(outbox) >= OUTBOX_SIZE:
+            self.metrics.outbox_overflows += 1
+            _LOGGER.warning("Outbound queue of %s overflowed, closing", conn)
+            outbox.clear()
+            conn.abort()
+            return False
+        if payload is GET_CMD:
+            conn.get_queued_at = time_monotonic()
+        outbox.append(payload)
+        conn.outbox_ready.set()
+        return True
+
+    async def _write_loop(self, conn: AirnutConnection):
+        """Write queued commands to one device (每个连接唯一的写协程).
+
+        Only this task awaits drain(), so a device with a full receive window
+        stalls its own queue but never the parsing of its inbound data or the
+        poll loop. A drain that misses POLL_DRAIN_TIMEOUT evicts the device.
+        """
+        writer = conn.writer
+        outbox = conn.outbox
         try:
-            writer.write(json.dumps(volume_cmd).encode("utf-8"))
-            await writer.drain()
-            writer.write(json.dumps(get_cmd).encode("utf-8"))
-            await writer.drain()
+            while True:
+                await conn.outbox_ready.wait()
+                conn.outbox_ready.clear()
+                while outbox:
+                    payload = outbox.popleft()
+                    start = time_monotonic()
+                    if payload is GET_CMD:
+                        conn.get_sent_at = start
+                    if self._capture:
+                        self._capture.write(conn.serial, KIND_OUT, payload)
+                    writer.write(payload)
+                    await asyncio.wait_for(writer.drain(), POLL_DRAIN_TIMEOUT)
+                    now = time_monotonic()
+                    self.metrics.drain_wait.observe(now - start)
+                    if payload is GET_CMD:
+                        # 从入队到写入内核缓冲区的完整耗时，反映轮询实际送达情况
+                        self.metrics.gets_delivered += 1
+                        self.metrics.get_delivery.observe(now - conn.get_queued_at)
+        except asyncio.TimeoutError:
+            _LOGGER.warning(
+                "Device %s did not drain within %ss, evicting", conn.ip, POLL_DRAIN_TIMEOUT
+            )
         except Exception as e:
-            _LOGGER.error("Failed to send initial commands: %s", e)
+            _LOGGER.warning("Failed to write to %s: %s", conn.ip, e)
+        conn.abort()
 
-    async def _parse_device_data(self, client_ip: str, data: bytes):
-        """Parse data received from Airnut device."""
+    def _parse_device_data(self, conn: AirnutConnection, data: bytes):
+        """Feed received bytes to the connection decoder and handle complete frames."""
+        client_ip = conn.ip
+        decoder = conn.decoder
+        metrics = self.metrics
+        start = perf_counter()
+        overflow = None
         try:
-            raw_data = data.decode("utf-8").strip()
-            for line in raw_data.split("\n\r"):
-                if not line:
-                    continue
-                json_data = json.loads(line)
-                if json_data.get("p") == "log_in":
-                    # Respond to login request
-                    login_resp = {"type": "client", "socket_id": 18567, "result": 0, "p": "log_in"}
-                    writer = next(w for w, ip in self._clients.items() if ip == client_ip)
-                    writer.write(json.dumps(login_resp).encode("utf-8"))
-                    await writer.drain()
-                elif json_data.get("p") == "post":
-                    # Parse sensor data
-                    indoor_data = json_data["param"]["indoor"]
-                    device_data = AirnutDeviceData(
-                        temperature=round(float(indoor_data["t"]), 1),
-                        humidity=round(float(indoor_data["h"]), 1),
-                        pm25=int(indoor_data["pm25"]),
-                        co2=int(indoor_data["co2"]),
-                        last_update=datetime.now(),
-                    )
-                    self._device_data[client_ip] = device_data
-                    _LOGGER.debug("Updated data for %s: %s", client_ip, device_data)
-        except json.JSONDecodeError:
-            _LOGGER.warning("Invalid JSON data from %s: %s", client_ip, data)
-        except KeyError as e:
-            _LOGGER.warning("Missing key in device data: %s", e)
-
-    async def update_device_data(self):
-        """Poll all connected devices for latest data (per scan interval)."""
-        now = datetime.now()
-        if (now - self._last_scan).total_seconds() < self._scan_interval:
+            messages = decoder.feed(data)
+        except FrameTooLargeError as e:
+            # 超长帧之前已完整解析的帧照常处理，再断开连接
+            messages, overflow = e.frames, e
+        finally:
+            metrics.parse_time.observe(perf_counter() - start)
+        metrics.frames += len(messages) + len(decoder.rejected)
+        if decoder.rejected:
+            metrics.parse_errors += len(decoder.rejected)
+            for frame in decoder.rejected:
+                _LOGGER.warning("Invalid JSON data from %s: %s", client_ip, frame)
+            decoder.rejected.clear()
+
+        for json_data in messages:
+            if not isinstance(json_data, dict):
+                metrics.parse_errors += 1
+                _LOGGER.warning("Unexpected frame from %s: %s", client_ip, json_data)
+                continue
+            try:
+                self._handle_frame(conn, json_data)
+            except KeyError as e:
+                metrics.parse_errors += 1
+                _LOGGER.warning("Missing key in device data: %s", e)
+            except (TypeError, ValueError) as e:
+                metrics.parse_errors += 1
+                _LOGGER.warning("Invalid value in device data from %s: %s", client_ip, e)
+        if overflow is not None:
+            raise overflow
+
+    def _handle_frame(self, conn: AirnutConnection, json_data: dict):
+        """Handle one decoded frame from an Airnut device."""
+        client_ip = conn.ip
+        if json_data.get("p") == "log_in":
+            self._register_device(conn, login_identity(json_data))
+            # Respond to login request
+            self._send(conn, LOGIN_RESP)
+        elif json_data.get("p") == "post":
+            # Parse sensor data
+            indoor_data = json_data["param"]["indoor"]
+            now = time_monotonic()
+            device_data = AirnutDeviceData(
+                round(float(indoor_data["t"]), 1),
+                round(float(indoor_data["h"]), 1),
+                int(indoor_data["pm25"]),
+                int(indoor_data["co2"]),
+                now,
+            )
+            self._record_post(conn, now)
+            interval = self._scheduler.interval(conn)
+            self._scheduler.observe(conn, now, device_data.pm25, device_data.co2)
+            if self._scheduler.interval(conn) != interval:
+                self._schedule_changed.set()
+            self._store_reading(conn.key, conn.ip, device_data)
+
+    def _store_reading(self, key: str, ip: str, device_data: AirnutDeviceData) -> None:
+        """Record a parsed reading under the device key and queue it for the next batch."""
+        if self._addresses.get(key) != ip:
+            self._addresses[key] = ip
+            self._ip_keys[ip] = key
+        self._device_data[key] = device_data
+        history = self._history.get(key)
+        if history is None:
+            history = self._history[key] = DeviceHistory(self._history_size)
+        wall = device_data.wall_time()
+        values = (device_data.temperature, device_data.humidity, device_data.pm25, device_data.co2)
+        history.append(wall, *values)
+        self._hourly.add(key, wall, values)
+        _LOGGER.debug("Updated data for %s: %s", key, device_data)
+        # 同一窗口内同一设备只发布最新读数（历史已逐条记录）
+        self._pending[key] = device_data
+        if self._publish_handle is None:
+            self._publish_handle = asyncio.get_running_loop().call_later(
+                self._publish_window, self._publish
+            )
+
+    def _publish(self) -> None:
+        """Hand the readings collected in the window to listeners as one batch.
+
+        A reading waits at most publish_window plus event-loop lag; the
+        actual time from receipt to publication is recorded in
+        metrics.publish_delay.
+        """
+        self._publish_handle = None
+        batch, self._pending = self._pending, {}
+        now = time_monotonic()
+        metrics = self.metrics
+        for device_data in batch.values():
+            metrics.publish_delay.observe(now - device_data.timestamp)
+        metrics.batches += 1
+        metrics.published += len(batch)
+        for listener in list(self._listeners):
+            listener(batch)
+
+    def _ingest(
+        self, ip: str, key: str, temperature: float, humidity: float, pm25: int, co2: int, ts: float
+    ) -> None:
+        """Store a reading forwarded by a worker process (ts is a Unix timestamp)."""
+        self._store_reading(key, ip, AirnutDeviceData(
+            temperature, humidity, pm25, co2, ts - (wall_clock() - time_monotonic())
+        ))
+
+    def _record_post(self, conn: AirnutConnection, now: float) -> None:
+        """Update arrival and poll round-trip metrics for a post frame."""
+        metrics = self.metrics
+        metrics.arrivals.record(now)
+        counters = metrics.device(conn.key)
+        counters.frames += 1
+        if conn.get_sent_at is not None:
+            counters.last_rtt = now - conn.get_sent_at
+            metrics.poll_rtt.observe(counters.last_rtt)
+            conn.get_sent_at = None
+
+    def _register_device(self, conn: AirnutConnection, device_id: str | None):
+        """Index a connection by device id, closing any stale socket for the same device.
+
+        The connection is counted in the device's metrics from here on, once
+        its key is known.
+        """
+        if not conn.logged_in:
+            conn.logged_in = True
+            self.metrics.connected(device_id or conn.ip)
+        if device_id is None:
             return
+        stale = self._devices.get(device_id)
+        if stale is not None and stale is not conn:
+            _LOGGER.info("Device %s reconnected from %s, closing stale %s", device_id, conn.ip, stale)
+            stale.abort()
+        conn.device_id = device_id
+        self._devices[device_id] = conn
+
+    @property
+    def connections(self) -> list[AirnutConnection]:
+        """All live device connections."""
+        return list(self._clients.values())
+
+    def poll_interval(self, conn: AirnutConnection) -> float | None:
+        """Current adaptive poll interval of a connection."""
+        return self._scheduler.interval(conn)
+
+    def get_connection(self, device_id: str) -> AirnutConnection | None:
+        """Get the live connection for a device id."""
+        return self._devices.get(device_id)
 
-        # Skip update if night time and night update is disabled
-        if not self._night_update and self._is_night_time():
+    async def update_device_data(self) -> int:
+        """Queue a get for every device whose next poll is due.
+
+        Returns the number of gets queued. Delivery happens in each
+        connection's writer task and is measured there (gets_delivered and
+        the get_delivery histogram); replies show in poll_rtt.
+        """
+        night = self.night
+        conns = self._scheduler.pop_due(
+            time_monotonic(), night=lambda conn: night.is_night(conn.ip, conn.device_id)
+        )
+        if not conns:
+            return 0
+
+        # 夜间暂停更新或处于免打扰时段的设备本轮不轮询（按各设备所属配置条目的设置）
+        conns = [conn for conn in conns if not night.suppressed(conn.ip, conn.device_id)]
+        if not conns:
             _LOGGER.debug("Skipping update (night time)")
-            return
+            return 0
 
-        self._last_scan = now
-        get_cmd = {
-            "sendback_appserver": 100000007,
-            "param": {"socket_id": 100000007, "type": 1, "check_key": "s_get19085"},
-            "p": "get",
-            "type": "control",
-            "check_key": "s_get19085",
+        # 只入队，由各连接的写协程发送，单个慢设备不阻塞其他设备
+        queued = sum(self._send(conn, GET_CMD) for conn in conns)
+        _LOGGER.debug("Queued get for %d/%d devices (%d evicted)", queued, len(conns), len(conns) - queued)
+        return queued
+
+    def device_key(self, ip: str) -> str:
+        """Key of the device that last reported from ip, or ip itself if none did.
+
+        Manually added devices are configured by IP only and resolve their
+        key through this on every lookup.
+        """
+        return self._ip_keys.get(ip, ip)
+
+    def device_ip(self, key: str) -> str | None:
+        """IP a device last reported from."""
+        return self._addresses.get(key)
+
+    def get_device_data(self, key: str) -> AirnutDeviceData | None:
+        """Get latest data of a device by its key (login identity, else IP)."""
+        return self._device_data.get(key)
+
+    def snapshot(self) -> dict:
+        """Last-known readings and history of every device, JSON-serializable."""
+        return {
+            "devices": {
+                key: [data.temperature, data.humidity, data.pm25, data.co2, data.wall_time()]
+                for key, data in self._device_data.items()
+                if data.timestamp is not None
+            },
+            "history": {key: history.to_dict() for key, history in self._history.items()},
+            "addresses": dict(self._addresses),
+            "statistics_exported_until": self._hourly.exported_until,
         }
 
-        # Send get command to all connected clients
-        for writer in list(self._clients.keys()):
+    def restore(self, snapshot: dict) -> None:
+        """Seed device data and history from a snapshot (warm restart).
+
+        Live readings always win: devices that already reported since start
+        are not overwritten.
+        """
+        # 快照保存墙钟时间，恢复时换算回单调时钟
+        offset = wall_clock() - time_monotonic()
+        for key, reading in snapshot.get("devices", {}).items():
             try:
-                writer.write(json.dumps(get_cmd).encode("utf-8"))
-                await writer.drain()
-            except Exception as e:
-                _LOGGER.warning("Failed to send get command to %s: %s", self._clients[writer], e)
-                del self._clients[writer]
+                temperature, humidity, pm25, co2, ts = reading
+                data = AirnutDeviceData(temperature, humidity, pm25, co2, ts - offset)
+            except (TypeError, ValueError) as e:
+                _LOGGER.warning("Discarding corrupt snapshot for %s: %s", key, e)
+                continue
+            self._device_data.setdefault(sys.intern(key), data)
+        for key, ip in snapshot.get("addresses", {}).items():
+            if key not in self._addresses:
+                self._addresses[sys.intern(key)] = ip = sys.intern(ip)
+                self._ip_keys.setdefault(ip, key)
+        for key, data in snapshot.get("history", {}).items():
+            if key in self._history:
+                continue
+            try:
+                self._history[sys.intern(key)] = DeviceHistory.from_dict(data, self._history_size)
+            except (KeyError, ValueError) as e:
+                _LOGGER.warning("Discarding corrupt history snapshot for %s: %s", key, e)
+        # 用恢复的历史重建尚未导出的小时桶，停机前未导出的小时随下次导出一并补上
+        self._hourly.exported_until = snapshot.get("statistics_exported_until") or 0.0
+        for key, history in self._history.items():
+            for ts, *values in history.samples(self._hourly.exported_until):
+                self._hourly.add(key, ts, values)
+        _LOGGER.info("Restored snapshot for %d devices", len(snapshot.get("devices", {})))
+
+    def is_stale(self, key: str) -> bool:
+        """True if a device's last reading is older than its longest poll interval."""
+        data = self._device_data.get(key)
+        if data is None or data.timestamp is None:
+            return True
+        return time_monotonic() - data.timestamp > self._scan_interval * POLL_INTERVAL_MAX_FACTOR
+
+    def is_suppressed(self, key: str) -> bool:
+        """True while polls and state writes of a device (by key) are off.
+
+        Quiet windows are configured per IP, so a device is checked against
+        the IP it last reported from.
+        """
+        return self.night.suppressed(self._addresses.get(key, key), key)
+
+    def is_available(self, key: str) -> bool:
+        """True if a device reported within idle_timeout.
+
+        While night polling is switched off, or the device is in its quiet
+        window, it is expected to be silent, so availability then only
+        requires a known reading.
+        """
+        data = self._device_data.get(key)
+        if data is None or data.timestamp is None:
+            return False
+        if self.is_suppressed(key):
+            return True
+        return time_monotonic() - data.timestamp <= self._idle_timeout
+
+    def get_all_device_data(self) -> dict[str, AirnutDeviceData]:
+        """Latest reading of every device, keyed by device key.
+
+        Records are immutable, so a shallow copy is a consistent view.
+        """
+        return dict(self._device_data)
+
+    def pop_hourly_statistics(self, now: float | None = None) -> list[HourlyStat]:
+        """Hourly mean/min/max of every device for each hour closed since the last call."""
+        return self._hourly.pop_completed(wall_clock() if now is None else now)
+
+    def get_device_history(self, key: str) -> DeviceHistory | None:
+        """Get the reading history of a device by its key."""
+        return self._history.get(key)
+
+    def arrival_distribution(self) -> dict:
+        """Per-second distribution of post arrivals over the last scan interval."""
+        return self.metrics.arrivals.distribution()
+
+
+class ServerRegistry:
+    """Running socket servers by name (替代原先的进程级单例).
+
+    Starting a name that is already running reconfigures that server in
+    place instead of binding its ports a second time.
+    """
+
+    def __init__(self):
+        self._servers: dict[str, AirnutAsyncSocketServer] = {}
+
+    def get(self, name: str) -> AirnutAsyncSocketServer | None:
+        """The running server registered under name."""
+        return self._servers.get(name)
+
+    async def async_start(
+        self,
+        name: str,
+        config: dict,
+        snapshot: dict | None = None,
+        clock: Callable[[], datetime] = datetime.now,
+    ) -> AirnutAsyncSocketServer:
+        """Start a server under name, or reconfigure the one already running.
+
+        snapshot seeds a newly created server before it starts listening;
+        clock is the local time used for night windows.
+        """
+        server = self._servers.get(name)
+        if server is not None:
+            await server.reconfigure(config)
+            return server
+        server = AirnutAsyncSocketServer(config, clock)
+        if snapshot:
+            server.restore(snapshot)
+        await server.start()
+        self._servers[name] = server
+        return server
+
+    async def async_stop(self, name: str) -> None:
+        """Stop and unregister the server under name."""
+        server = self._servers.pop(name, None)
+        if server is not None:
+            await server.stop()
+
 
-    def get_device_data(self, ip: str) -> AirnutDeviceData | None:
-        """Get latest data for a specific device IP."""
-        return self._device_data.get(ip)
\ No newline at end of file
+SERVERS = ServerRegistry()
@@ -0,0 +1,189 @@
+"""Multi-process accept/parse workers for the Airnut socket server.
+
+With ``workers: N`` the process hosting Home Assistant does not listen on
+the device port itself. It spawns N worker processes, each running a
+regular AirnutAsyncSocketServer bound to the same port with SO_REUSEPORT,
+so the kernel spreads device connections across them. Workers handle the
+handshake, polling and parsing, and forward each reading to the parent
+over a Unix socket as one binary record: a fixed-size header with the
+device IP followed by the device key (login identity, else IP).
+"""
+import asyncio
+import logging
+import multiprocessing
+import os
+import socket
+import struct
+import sys
+import tempfile
+from collections.abc import Callable
+
+from .const import (
+    CONF_CAPTURE_PATH,
+    CONF_HISTORY_SIZE,
+    CONF_PUBLISH_WINDOW,
+    CONF_WORKERS,
+    WORKER_RESTART_DELAY,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+# IPv4地址、设备键长度、温度、湿度、PM2.5、CO2、上报时间戳（墙钟秒），共29字节，其后紧跟UTF-8编码的设备键
+RECORD = struct.Struct("!4sBffIId")
+_READ_SIZE = 16384  # 每次读取的字节数
+
+
+def _worker_main(config: dict, socket_path: str, log_level: int) -> None:
+    """Entry point of a worker process."""
+    logging.basicConfig(
+        level=log_level,
+        format=f"%(asctime)s %(levelname)s %(name)s[{os.getpid()}]: %(message)s",
+    )
+    try:
+        asyncio.run(_worker_run(config, socket_path))
+    except KeyboardInterrupt:
+        pass
+
+
+async def _worker_run(config: dict, socket_path: str) -> None:
+    from .socket_server import AirnutAsyncSocketServer
+
+    if config.get(CONF_CAPTURE_PATH):
+        # 每个子进程写各自的抓包文件
+        config = {**config, CONF_CAPTURE_PATH: f"{config[CONF_CAPTURE_PATH]}.{os.getpid()}"}
+    parent, ipc = await asyncio.open_unix_connection(socket_path)
+    server = AirnutAsyncSocketServer(config)
+
+    def _forward(batch: dict) -> None:
+        records = []
+        for device_key, data in batch.items():
+            key = device_key.encode()[:255]
+            records.append(RECORD.pack(
+                socket.inet_aton(server.device_ip(device_key)),
+                len(key), data.temperature, data.humidity, data.pm25, data.co2, data.wall_time(),
+            ))
+            records.append(key)
+        ipc.write(b"".join(records))
+
+    server.add_listener(_forward)
+    await server.start()
+    try:
+        # 主进程从不写入IPC，读到EOF即表示其已退出
+        await parent.read()
+    finally:
+        await server.stop()
+
+
+class WorkerPool:
+    """Spawn, supervise and collect readings from the worker processes."""
+
+    def __init__(
+        self,
+        config: dict,
+        count: int,
+        on_reading: Callable[[str, str, float, float, int, int, float], None],
+    ):
+        # 子进程只负责接入与解析，历史由主进程保存；发布窗口只在主进程生效
+        self._config = {**config, CONF_WORKERS: 0, CONF_HISTORY_SIZE: 1, CONF_PUBLISH_WINDOW: 0}
+        self._count = count
+        self._on_reading = on_reading
+        self._socket_path = os.path.join(
+            tempfile.gettempdir(), f"airnut-{os.getpid()}.sock"
+        )
+        self._ipc_server: asyncio.AbstractServer | None = None
+        self._processes: list[multiprocessing.Process] = []
+        self._supervisor: asyncio.Task | None = None
+        # spawn而非fork：HA进程内有多个线程，fork后状态不可靠
+        self._context = multiprocessing.get_context("spawn")
+        self.records = 0
+
+    async def start(self) -> None:
+        """Open the IPC socket and spawn the workers."""
+        if os.path.exists(self._socket_path):
+            os.unlink(self._socket_path)
+        self._ipc_server = await asyncio.start_unix_server(
+            self._handle_worker, path=self._socket_path
+        )
+        self._processes = [self._spawn() for _ in range(self._count)]
+        self._supervisor = asyncio.create_task(self._supervise())
+        _LOGGER.info("Started %d Airnut worker processes", self._count)
+
+    def _spawn(self) -> multiprocessing.Process:
+        process = self._context.Process(
+            target=_worker_main,
+            args=(self._config, self._socket_path, logging.getLogger(__package__).getEffectiveLevel()),
+            name="airnut-worker",
+            daemon=True,
+        )
+        process.start()
+        return process
+
+    async def _supervise(self) -> None:
+        """Restart workers that exited unexpectedly."""
+        while True:
+            await asyncio.sleep(WORKER_RESTART_DELAY)
+            for i, process in enumerate(self._processes):
+                if not process.is_alive():
+                    _LOGGER.warning(
+                        "Airnut worker %s exited with %s, restarting", process.pid, process.exitcode
+                    )
+                    process.close()
+                    self._processes[i] = self._spawn()
+
+    async def _handle_worker(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        """Decode the record stream of one worker."""
+        pending = b""
+        size = RECORD.size
+        try:
+            while True:
+                data = await reader.read(_READ_SIZE)
+                if not data:
+                    break
+                if pending:
+                    data = pending + data
+                pos = 0
+                while len(data) - pos >= size:
+                    ip, length, temperature, humidity, pm25, co2, ts = RECORD.unpack_from(data, pos)
+                    end = pos + size + length
+                    if end > len(data):
+                        break  # 设备键尚未完整到达
+                    key = sys.intern(data[pos + size:end].decode())
+                    pos = end
+                    self.records += 1
+                    # float32传输，按原精度还原
+                    self._on_reading(
+                        sys.intern(socket.inet_ntoa(ip)), key,
+                        round(temperature, 1), round(humidity, 1), pm25, co2, ts,
+                    )
+                pending = data[pos:]
+        except Exception as e:
+            _LOGGER.error("Error reading from Airnut worker: %s", e)
+        finally:
+            writer.close()
+
+    async def stop(self) -> None:
+        """Stop the workers and remove the IPC socket."""
+        if self._supervisor:
+            self._supervisor.cancel()
+            self._supervisor = None
+        if self._ipc_server:
+            self._ipc_server.close()
+            self._ipc_server = None
+        for process in self._processes:
+            process.terminate()
+        loop = asyncio.get_running_loop()
+        for process in self._processes:
+            await loop.run_in_executor(None, process.join, WORKER_RESTART_DELAY)
+            if process.is_alive():
+                process.kill()
+                await loop.run_in_executor(None, process.join)
+        self._processes = []
+        if os.path.exists(self._socket_path):
+            os.unlink(self._socket_path)
+
+    @property
+    def pids(self) -> list[int]:
+        """PIDs of the running workers."""
+        return [process.pid for process in self._processes if process.is_alive()]
@@ -0,0 +1,5 @@
+"""Make the repository root importable, so plain ``pytest`` works from any directory."""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
@@ -0,0 +1,43 @@
+"""Tests for traffic capture and its reader."""
+from custom_components.airnut.capture import (
+    KIND_IN,
+    KIND_OPEN,
+    CaptureWriter,
+    capture_files,
+    read_capture,
+)
+
+
+def test_round_trip(tmp_path):
+    path = str(tmp_path / "capture.bin")
+    writer = CaptureWriter(path, 1 << 20, 2, 100)
+    writer.write(1, KIND_OPEN, b"192.168.1.20:5000")
+    writer.write(1, KIND_IN, b'{"p": "post"}')
+    writer.close()
+    records = list(read_capture(path))
+    assert [(r.serial, r.kind, r.payload) for r in records] == [
+        (1, KIND_OPEN, b"192.168.1.20:5000"),
+        (1, KIND_IN, b'{"p": "post"}'),
+    ]
+
+
+def test_rotation_keeps_backups(tmp_path):
+    path = str(tmp_path / "capture.bin")
+    writer = CaptureWriter(path, 200, 2, 1000)
+    for i in range(50):
+        writer.write(i, KIND_IN, b"x" * 40)
+    writer.close()
+    files = capture_files(path)
+    assert files == [f"{path}.2", f"{path}.1", path]
+    serials = [r.serial for name in files for r in read_capture(name)]
+    # 只保留最近的记录，且按时间顺序
+    assert serials == sorted(serials) and serials[-1] == 49
+
+
+def test_open_failure_does_not_block(tmp_path):
+    path = tmp_path / "missing" / "capture.bin"
+    writer = CaptureWriter(str(path), 1 << 20, 0, 1)
+    for i in range(100):
+        writer.write(i, KIND_IN, b"x")  # 队列满时丢弃，不阻塞调用方
+    writer.close()
+    assert not path.exists()
@@ -0,0 +1,46 @@
+"""Tests for the per-device ring buffer history."""
+from custom_components.airnut.history import DeviceHistory
+
+
+def _fill(history: DeviceHistory, count: int, start: float = 0.0, step: float = 60.0) -> None:
+    for i in range(count):
+        history.append(start + i * step, 20.0, 40.0, float(i), 600.0 + i)
+
+
+def test_ring_wraps_and_keeps_newest():
+    history = DeviceHistory(4)
+    _fill(history, 6)
+    assert len(history) == 4
+    assert [sample[0] for sample in history.samples()] == [120.0, 180.0, 240.0, 300.0]
+    assert [sample[3] for sample in history.samples(200.0)] == [4.0, 5.0]
+
+
+def test_aggregate_across_wrap():
+    history = DeviceHistory(4)
+    _fill(history, 6)
+    assert history.aggregate("co2", 150, now=300.0) == {"min": 603.0, "max": 605.0, "mean": 604.0}
+
+
+def test_from_dict_truncates_to_capacity():
+    history = DeviceHistory(10)
+    _fill(history, 8)
+    restored = DeviceHistory.from_dict(history.to_dict(), 3)
+    assert len(restored) == 3
+    assert [sample[0] for sample in restored.samples()] == [300.0, 360.0, 420.0]
+    assert list(DeviceHistory.from_dict(history.to_dict(), 20).samples()) == list(history.samples())
+
+
+def test_summary_omits_windows_beyond_retained_span():
+    history = DeviceHistory(120)
+    _fill(history, 200, step=30.0)  # 满缓冲区只覆盖一小时
+    now = 199 * 30.0
+    summary = history.summary("co2", now)
+    assert "mean_5m" in summary
+    assert "mean_1h" not in summary and "mean_24h" not in summary
+    assert history.span(now) == 119 * 30.0
+
+
+def test_summary_reports_partial_windows_before_buffer_fills():
+    history = DeviceHistory(1440)
+    _fill(history, 10)
+    assert "mean_24h" in history.summary("co2", 9 * 60.0)
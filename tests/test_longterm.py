@@ -0,0 +1,55 @@
+"""Tests for hourly statistics aggregation."""
+from custom_components.airnut.history import DeviceHistory
+from custom_components.airnut.longterm import HOUR, HourlyAggregator
+from custom_components.airnut.socket_server import AirnutAsyncSocketServer
+
+T0 = 1_767_225_600.0  # 2026-01-01 00:00 UTC，整点
+
+
+def _co2(stats):
+    return [(stat.key, stat.start, stat.mean, stat.min, stat.max) for stat in stats if stat.field == "co2"]
+
+
+def test_rollover_closes_previous_hour():
+    aggregator = HourlyAggregator()
+    aggregator.add("dev", T0 + 10, (20.0, 40.0, 5, 600))
+    aggregator.add("dev", T0 + 20, (21.0, 41.0, 7, 800))
+    assert aggregator.pop_completed(T0 + 30) == []
+    aggregator.add("dev", T0 + HOUR + 5, (22.0, 42.0, 9, 1000))
+    assert _co2(aggregator.pop_completed(T0 + HOUR + 10)) == [("dev", T0, 700.0, 600.0, 800.0)]
+    assert aggregator.exported_until == T0 + HOUR
+
+
+def test_pop_completed_closes_silent_devices():
+    aggregator = HourlyAggregator()
+    aggregator.add("a", T0 + 10, (20.0, 40.0, 5, 600))
+    aggregator.add("b", T0 + HOUR + 10, (20.0, 40.0, 5, 500))
+    stats = aggregator.pop_completed(T0 + 2 * HOUR)
+    assert sorted(_co2(stats)) == [("a", T0, 600.0, 600.0, 600.0), ("b", T0 + HOUR, 500.0, 500.0, 500.0)]
+    assert aggregator.exported_until == T0 + 2 * HOUR
+    assert aggregator.pop_completed(T0 + 2 * HOUR) == []
+
+
+def test_late_readings_are_dropped():
+    aggregator = HourlyAggregator()
+    aggregator.add("dev", T0 + HOUR + 10, (20.0, 40.0, 5, 600))
+    aggregator.add("dev", T0 + 10, (20.0, 40.0, 5, 9999))  # 所在小时早于当前打开的小时
+    assert aggregator.pop_completed(T0 + 2 * HOUR)[0].start == T0 + HOUR
+    # 已导出小时内的读数（如另一设备的迟到数据）不再重新打开该小时
+    aggregator.add("other", T0 + HOUR + 20, (20.0, 40.0, 5, 600))
+    assert aggregator.pop_completed(T0 + 3 * HOUR) == []
+
+
+def test_restore_rebuilds_unexported_hours_from_history():
+    history = DeviceHistory(100)
+    for minute in range(0, 180, 30):
+        history.append(T0 + minute * 60, 20.0, 40.0, 5, 600 + minute)
+    server = AirnutAsyncSocketServer({})
+    server.restore({
+        "devices": {},
+        "history": {"10.0.0.1": history.to_dict()},
+        "statistics_exported_until": T0 + HOUR,  # 第一个小时已导出
+    })
+    stats = server.pop_hourly_statistics(T0 + 3 * HOUR)
+    assert [start for _, start, *_ in _co2(stats)] == [T0 + HOUR, T0 + 2 * HOUR]
+    assert _co2(stats)[0] == ("10.0.0.1", T0 + HOUR, 675.0, 660.0, 690.0)
@@ -0,0 +1,120 @@
+"""Tests for the night and quiet-window schedule."""
+import asyncio
+from datetime import datetime, time
+
+from custom_components.airnut.night import NightSchedule, TimeWindow, parse_window
+
+
+class FakeClock:
+    def __init__(self, now: datetime):
+        self.now = now
+
+    def __call__(self) -> datetime:
+        return self.now
+
+
+def test_window_half_open():
+    window = TimeWindow(time(8, 0), time(17, 0))
+    assert window.contains(time(8, 0))
+    assert window.contains(time(16, 59, 59))
+    assert not window.contains(time(17, 0))
+    assert not window.contains(time(7, 59))
+
+
+def test_window_wraps_midnight():
+    window = TimeWindow(time(23, 0), time(6, 0))
+    assert window.contains(time(23, 0))
+    assert window.contains(time(0, 0))
+    assert window.contains(time(5, 59))
+    assert not window.contains(time(6, 0))
+    assert not window.contains(time(22, 59))
+
+
+def test_empty_window():
+    window = TimeWindow(time(12, 0), time(12, 0))
+    assert not any(window.contains(time(hour, 0)) for hour in range(24))
+
+
+def test_next_boundary():
+    window = TimeWindow(time(23, 0), time(6, 0))
+    assert window.next_boundary(datetime(2026, 1, 1, 12, 0)) == datetime(2026, 1, 1, 23, 0)
+    assert window.next_boundary(datetime(2026, 1, 1, 23, 30)) == datetime(2026, 1, 2, 6, 0)
+    # 恰好位于边界时取下一个边界
+    assert window.next_boundary(datetime(2026, 1, 1, 23, 0)) == datetime(2026, 1, 2, 6, 0)
+    assert window.next_boundary(datetime(2026, 1, 2, 6, 0)) == datetime(2026, 1, 2, 23, 0)
+
+
+def test_invalid_window_disabled():
+    assert parse_window("25:00", "06:00", "night") is None
+    assert parse_window(None, "06:00", "night") is None
+    clock = FakeClock(datetime(2026, 1, 1, 2, 0))
+    schedule = NightSchedule({"night_start": "bad", "night_update": False}, clock)
+    assert not schedule.suppressed("10.0.0.1")
+    assert schedule.next_transition() is None
+
+
+def test_profile_lookup_order():
+    clock = FakeClock(datetime(2026, 1, 1, 2, 0))
+    schedule = NightSchedule({"night_start": "23:00", "night_end": "06:00", "night_update": True}, clock)
+    schedule.set_profile("entry", ["dev-a", "10.0.0.2"], {
+        "night_start": "01:00", "night_end": "03:00", "night_update": False,
+    })
+    assert schedule.suppressed("10.0.0.9", "dev-a")  # 按登录标识
+    assert schedule.suppressed("10.0.0.2")  # 按IP
+    assert not schedule.suppressed("10.0.0.3")  # 默认设置：夜间仍更新
+    assert schedule.is_night("10.0.0.3")
+
+    clock.now = datetime(2026, 1, 1, 4, 0)
+    schedule.refresh()
+    assert not schedule.suppressed("10.0.0.9", "dev-a")
+    assert schedule.is_night("10.0.0.3")
+
+
+def test_set_profile_replaces_and_remove_restores_default():
+    clock = FakeClock(datetime(2026, 1, 1, 2, 0))
+    schedule = NightSchedule({"night_start": "23:00", "night_end": "06:00"}, clock)
+    off = {"night_start": "00:00", "night_end": "12:00", "night_update": False}
+    schedule.set_profile("entry", ["dev-a", "dev-b"], off)
+    schedule.set_profile("entry", ["dev-b"], off)
+    assert not schedule.suppressed("10.0.0.1", "dev-a")
+    assert schedule.suppressed("10.0.0.1", "dev-b")
+    schedule.remove_profile("entry")
+    assert not schedule.suppressed("10.0.0.1", "dev-b")
+    schedule.remove_profile("missing")
+
+
+def test_quiet_window_independent_of_night():
+    clock = FakeClock(datetime(2026, 1, 1, 12, 30))
+    schedule = NightSchedule({
+        "night_update": True,
+        "quiet_windows": {"10.0.0.5": {"start": "12:00", "end": "13:00"}},
+    }, clock)
+    assert schedule.suppressed("10.0.0.5")
+    assert not schedule.suppressed("10.0.0.6")
+    assert schedule.next_transition() == datetime(2026, 1, 1, 13, 0)
+    clock.now = datetime(2026, 1, 1, 13, 0)
+    assert schedule.refresh()
+    assert not schedule.suppressed("10.0.0.5")
+
+
+def test_configure_keeps_profiles():
+    clock = FakeClock(datetime(2026, 1, 1, 2, 0))
+    schedule = NightSchedule({}, clock)
+    schedule.set_profile("entry", ["dev-a"], {"night_update": False})
+    schedule.configure({"night_update": True})
+    assert schedule.suppressed("10.0.0.1", "dev-a")
+
+
+def test_timer_flips_state_at_transition():
+    clock = FakeClock(datetime(2026, 1, 1, 22, 59, 59, 950000))
+    schedule = NightSchedule({"night_update": False}, clock)
+
+    async def run() -> None:
+        schedule.start()
+        assert not schedule.suppressed("10.0.0.1")
+        clock.now = datetime(2026, 1, 1, 23, 0)
+        await asyncio.sleep(0.1)
+        assert schedule.suppressed("10.0.0.1")
+        schedule.stop()
+
+    asyncio.run(run())
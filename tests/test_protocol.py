@@ -0,0 +1,79 @@
+"""Tests for the Airnut frame decoder."""
+import pytest
+
+from custom_components.airnut.protocol import FRAME_DELIMITER, FrameDecoder, FrameTooLargeError
+
+POST = b'{"p": "post", "param": {"indoor": {"pm25": 12, "co2": 600}}}'
+LOGIN = b'{"p": "log_in", "type": "client"}'
+
+
+def test_byte_by_byte():
+    decoder = FrameDecoder(1024)
+    frames = []
+    for i, byte in enumerate(POST + FRAME_DELIMITER):
+        frames += decoder.feed(bytes([byte]))
+        if i < len(POST) - 1:
+            assert frames == []
+    # 尾部"}"到达时即按无分隔符尾帧解析，随后的分隔符不会产生重复帧
+    assert frames == [{"p": "post", "param": {"indoor": {"pm25": 12, "co2": 600}}}]
+    assert len(decoder) == 0
+
+
+def test_delimiter_split_across_reads():
+    decoder = FrameDecoder(1024)
+    # 帧以"\n"结尾，不按尾帧解析，等分隔符的后半部分到达
+    assert decoder.feed(LOGIN + b"\n") == []
+    assert decoder.feed(b"\r" + POST[:10]) == [{"p": "log_in", "type": "client"}]
+    assert decoder.feed(POST[10:] + FRAME_DELIMITER)[0]["p"] == "post"
+
+
+def test_coalesced_burst():
+    decoder = FrameDecoder(1024)
+    frames = decoder.feed(LOGIN + FRAME_DELIMITER + POST + FRAME_DELIMITER + POST + FRAME_DELIMITER)
+    assert [frame["p"] for frame in frames] == ["log_in", "post", "post"]
+    assert len(decoder) == 0
+
+
+def test_final_frame_without_delimiter():
+    decoder = FrameDecoder(1024)
+    frames = decoder.feed(LOGIN + FRAME_DELIMITER + POST)
+    assert [frame["p"] for frame in frames] == ["log_in", "post"]
+    assert len(decoder) == 0
+
+
+def test_incomplete_tail_waits():
+    decoder = FrameDecoder(1024)
+    # 以"}"结尾但不是完整JSON对象，继续等待后续数据
+    assert decoder.feed(b'{"a": {"b": 1}') == []
+    assert decoder.feed(b"}") == [{"a": {"b": 1}}]
+
+
+def test_rejected_frame():
+    decoder = FrameDecoder(1024)
+    frames = decoder.feed(b"not json" + FRAME_DELIMITER + POST + FRAME_DELIMITER)
+    assert [frame["p"] for frame in frames] == ["post"]
+    assert decoder.rejected == [b"not json"]
+
+
+def test_too_large_mid_buffer_keeps_earlier_frames():
+    decoder = FrameDecoder(64)
+    with pytest.raises(FrameTooLargeError) as err:
+        decoder.feed(LOGIN + FRAME_DELIMITER + b"x" * 100 + FRAME_DELIMITER + POST)
+    assert err.value.frames == [{"p": "log_in", "type": "client"}]
+    assert len(decoder) == 0
+
+
+def test_too_large_tail_keeps_earlier_frames():
+    decoder = FrameDecoder(64)
+    with pytest.raises(FrameTooLargeError) as err:
+        decoder.feed(LOGIN + FRAME_DELIMITER + b"x" * 100)
+    assert err.value.frames == [{"p": "log_in", "type": "client"}]
+    assert len(decoder) == 0
+
+
+def test_too_large_accumulated_across_reads():
+    decoder = FrameDecoder(64)
+    assert decoder.feed(b"x" * 40) == []
+    with pytest.raises(FrameTooLargeError) as err:
+        decoder.feed(b"x" * 40)
+    assert err.value.frames == []
@@ -0,0 +1,74 @@
+"""Tests for the adaptive poll scheduler."""
+from custom_components.airnut.scheduler import AdaptivePollScheduler, TimerWheel
+
+
+def _scheduler() -> AdaptivePollScheduler:
+    scheduler = AdaptivePollScheduler(600, 30, 2400)
+    scheduler.add("dev", 0.0, "dev")
+    return scheduler
+
+
+def test_noise_in_close_posts_does_not_tighten():
+    scheduler = _scheduler()
+    for i, co2 in enumerate((600, 604, 600, 605, 601, 606)):
+        scheduler.observe("dev", 1000.0 + i * 3, 10, co2)
+    assert scheduler.interval("dev") == 600
+
+
+def test_noise_over_a_long_span_relaxes():
+    scheduler = _scheduler()
+    scheduler.observe("dev", 1000.0, 10, 600)
+    scheduler.observe("dev", 1600.0, 11, 610)
+    assert scheduler.interval("dev") > 600
+
+
+def test_fast_change_tightens():
+    scheduler = _scheduler()
+    scheduler.observe("dev", 1000.0, 10, 600)
+    scheduler.observe("dev", 1060.0, 10, 700)
+    assert scheduler.interval("dev") == 300
+
+
+def _expiry(wheel: TimerWheel, key: str, until: float) -> float | None:
+    """Advance tick by tick and return the time at which key expired."""
+    now = wheel.tick
+    while now <= until:
+        if key in wheel.advance(now):
+            return now
+        now += wheel.tick
+    return None
+
+
+def test_timer_wheel_expires_after_delay():
+    for delay in (1, 3, 7, 8, 9, 16, 17, 20):
+        wheel = TimerWheel(1.0, 8, 0.0)
+        wheel.add("conn", delay)
+        assert _expiry(wheel, "conn", 40) == delay, delay
+        assert len(wheel) == 0
+
+
+def test_timer_wheel_rounds_up_and_has_minimum_tick():
+    wheel = TimerWheel(5.0, 8, 0.0)
+    wheel.add("a", 7.0)
+    wheel.add("b", 0.0)
+    assert wheel.advance(5.0) == ["b"]
+    assert wheel.advance(10.0) == ["a"]
+
+
+def test_timer_wheel_rearm_and_remove():
+    wheel = TimerWheel(1.0, 8, 0.0)
+    wheel.add("a", 3)
+    wheel.add("a", 10)  # 重新挂入，替换原定时
+    wheel.add("b", 2)
+    wheel.remove("b")
+    wheel.remove("missing")
+    assert len(wheel) == 1
+    assert _expiry(wheel, "a", 40) == 10
+
+
+def test_timer_wheel_advance_skips_several_ticks():
+    wheel = TimerWheel(1.0, 8, 0.0)
+    wheel.add("a", 2)
+    wheel.add("b", 12)
+    assert wheel.advance(11.5) == ["a"]
+    assert wheel.advance(12.0) == ["b"]
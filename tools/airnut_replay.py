@@ -0,0 +1,129 @@
+"""Replay captured Airnut traffic through the socket server's parse path.
+
+Inbound bytes from a capture (written by the server when ``capture_path``
+is set) are fed, chunk for chunk as they were read from the socket, to
+each connection's FrameDecoder and frame handler. Outbound records are
+not sent anywhere. Run at full speed to profile parsing against real
+firmware traffic, or with --realtime to reproduce timing-dependent bugs.
+
+Usage:
+  python tools/airnut_replay.py capture.bin                 # the file and its rotated backups, full speed
+  python tools/airnut_replay.py capture.bin --realtime --speed 10
+  python tools/airnut_replay.py capture.bin --dump          # print the records instead of replaying
+  python -m cProfile -s cumtime tools/airnut_replay.py capture.bin --repeat 50
+"""
+import argparse
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from custom_components.airnut.capture import (  # noqa: E402
+    KIND_CLOSE,
+    KIND_IN,
+    KIND_NAMES,
+    KIND_OPEN,
+    capture_files,
+    read_capture,
+)
+from custom_components.airnut.socket_server import (  # noqa: E402
+    AirnutAsyncSocketServer,
+    AirnutConnection,
+)
+
+
+class _ReplayWriter:
+    """Writer of a replayed connection: nothing is sent, aborts are counted."""
+
+    def __init__(self):
+        self.transport = self
+        self.aborted = False
+
+    def abort(self) -> None:
+        self.aborted = True
+
+
+def _load(paths: list[str]) -> list:
+    records = []
+    for path in paths:
+        files = capture_files(path) or [path]
+        for name in files:
+            records.extend(read_capture(name))
+    return records
+
+
+def _dump(records: list) -> None:
+    for record in records:
+        stamp = time.strftime("%H:%M:%S", time.localtime(record.timestamp))
+        millis = int(record.timestamp * 1000) % 1000
+        print(f"{stamp}.{millis:03d} #{record.serial:<6} {KIND_NAMES.get(record.kind, '?'):<5} {record.payload!r}")
+
+
+async def _replay(records: list, args: argparse.Namespace) -> None:
+    server = AirnutAsyncSocketServer({"publish_window": 0})
+    conns: dict[int, AirnutConnection] = {}
+    inbound = 0
+    start = time.perf_counter()
+    for _ in range(args.repeat):
+        conns.clear()
+        first = records[0].timestamp if records else 0.0
+        pass_start = time.perf_counter()
+        for record in records:
+            if args.realtime:
+                delay = (record.timestamp - first) / args.speed - (time.perf_counter() - pass_start)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            if record.kind == KIND_OPEN:
+                ip, _, port = record.payload.decode().rpartition(":")
+                conns[record.serial] = AirnutConnection(_ReplayWriter(), (ip, int(port)))
+            elif record.kind == KIND_IN:
+                conn = conns.get(record.serial)
+                if conn is None:  # 连接建立于抓包轮转之前
+                    conn = conns[record.serial] = AirnutConnection(
+                        _ReplayWriter(), (f"0.0.{record.serial >> 8 & 255}.{record.serial & 255}", 0)
+                    )
+                inbound += len(record.payload)
+                try:
+                    server._parse_device_data(conn, record.payload)
+                except ValueError as e:  # 超长帧：服务端会断开该连接
+                    print(f"#{record.serial}: {e}")
+                    del conns[record.serial]
+                conn.outbox.clear()
+            elif record.kind == KIND_CLOSE:
+                conns.pop(record.serial, None)
+        await asyncio.sleep(0)  # 让批量发布回调执行
+    elapsed = time.perf_counter() - start
+
+    metrics = server.metrics
+    print(f"records            {len(records) * args.repeat}")
+    print(f"inbound bytes      {inbound}")
+    print(f"frames             {metrics.frames}")
+    print(f"parse errors       {metrics.parse_errors}")
+    print(f"readings           {sum(counters.frames for counters in metrics.devices.values())}")
+    print(f"elapsed (s)        {elapsed:10.3f}")
+    print(f"frames/s           {metrics.frames / elapsed:10.1f}")
+    print(f"MB/s               {inbound / elapsed / 1e6:10.2f}")
+    parse = metrics.parse_time.as_dict()
+    print(f"parse p50/p99 (ms) {parse['p50_ms']} / {parse['p99_ms']}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Replay captured Airnut traffic")
+    parser.add_argument("captures", nargs="+", help="capture file(s); rotated backups are included")
+    parser.add_argument("--realtime", action="store_true", help="keep the captured timing")
+    parser.add_argument("--speed", type=float, default=1.0, help="time scale with --realtime")
+    parser.add_argument("--repeat", type=int, default=1, help="replay the captures N times")
+    parser.add_argument("--dump", action="store_true", help="print the records and exit")
+    args = parser.parse_args()
+
+    records = _load(args.captures)
+    if args.dump:
+        _dump(records)
+        return
+    asyncio.run(_replay(records, args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,256 @@
+"""Simulated Airnut 1S device fleet and load benchmark.
+
+Each virtual device speaks the device side of the protocol: it connects to
+the socket server, sends ``log_in``, answers every ``get`` with a ``post``
+frame and can optionally post unsolicited readings, fragment its frames or
+stall. Devices bind distinct 127.x.y.z source addresses so the server keys
+them as separate devices.
+
+Usage:
+  python tools/airnut_sim.py --devices 500                  # against a server already on localhost:10511
+  python tools/airnut_sim.py --devices 1000 --in-process    # start AirnutAsyncSocketServer in this process
+  python tools/airnut_sim.py --devices 1000 --in-process --workers 4   # ... with 4 accept/parse worker processes
+
+With --in-process, ingest latency is measured from the moment a device
+writes a post frame to the moment the server publishes the parsed reading.
+"""
+import argparse
+import asyncio
+import json
+import random
+import resource
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+FRAME_DELIMITER = b"\n\r"
+GET_MARKER = b'"p": "get"'
+
+
+class SimStats:
+    """Counters shared by all virtual devices."""
+
+    def __init__(self):
+        self.connected = 0
+        self.connect_failed = 0
+        self.frames_sent = 0
+        self.bytes_sent = 0
+        self.gets_received = 0
+        self.latencies: list[float] = []
+        self.sent_at: dict[str, float] = {}  # device key -> perf_counter of last post
+
+
+def _source_address(index: int) -> str:
+    """Distinct loopback address per device (127.0.0.0/8 all routes to lo on Linux)."""
+    index += 2
+    return f"127.{(index >> 16) & 0xFF}.{(index >> 8) & 0xFF}.{index & 0xFF}"
+
+
+def _post_frame(rng: random.Random) -> bytes:
+    return json.dumps({
+        "p": "post",
+        "type": "client",
+        "param": {
+            "indoor": {
+                "t": f"{rng.uniform(18, 28):.1f}",
+                "h": f"{rng.uniform(30, 60):.1f}",
+                "pm25": str(rng.randint(1, 80)),
+                "co2": str(rng.randint(400, 1500)),
+            },
+        },
+    }).encode("utf-8") + FRAME_DELIMITER
+
+
+class VirtualDevice:
+    """One simulated Airnut 1S."""
+
+    def __init__(self, index: int, args: argparse.Namespace, stats: SimStats):
+        self.index = index
+        self.ip = _source_address(index)
+        self.identity = f"SIM{index:06d}"  # 服务端按登录标识发布读数
+        self.args = args
+        self.stats = stats
+        self.rng = random.Random(index)
+
+    async def _write(self, writer: asyncio.StreamWriter, frame: bytes) -> None:
+        """Write one frame, split into random fragments if requested."""
+        if self.args.fragment:
+            pos = 0
+            while pos < len(frame):
+                step = self.rng.randint(1, self.args.fragment)
+                writer.write(frame[pos:pos + step])
+                await writer.drain()
+                pos += step
+        else:
+            writer.write(frame)
+        await writer.drain()
+
+    async def _post(self, writer: asyncio.StreamWriter) -> None:
+        frame = _post_frame(self.rng)
+        self.stats.sent_at[self.identity] = time.perf_counter()
+        await self._write(writer, frame)
+        self.stats.frames_sent += 1
+        self.stats.bytes_sent += len(frame)
+
+    async def _unsolicited(self, writer: asyncio.StreamWriter) -> None:
+        await asyncio.sleep(self.rng.uniform(0, self.args.post_interval))
+        while True:
+            await self._post(writer)
+            await asyncio.sleep(self.args.post_interval)
+
+    async def run(self) -> None:
+        try:
+            reader, writer = await asyncio.open_connection(
+                self.args.host, self.args.port, local_addr=(self.ip, 0)
+            )
+        except OSError:
+            self.stats.connect_failed += 1
+            return
+        self.stats.connected += 1
+        login = json.dumps({"p": "log_in", "type": "client", "param": {"mac": self.identity}})
+        tasks = []
+        try:
+            await self._write(writer, login.encode("utf-8") + FRAME_DELIMITER)
+            if self.args.post_interval:
+                tasks.append(asyncio.create_task(self._unsolicited(writer)))
+            while True:
+                if self.args.stall and self.rng.random() < self.args.stall:
+                    # 模拟卡死的设备：停止读取，让服务端发送缓冲区堆积
+                    await asyncio.sleep(self.args.duration)
+                data = await reader.read(4096)
+                if not data:
+                    break
+                for _ in range(data.count(GET_MARKER)):
+                    self.stats.gets_received += 1
+                    await self._post(writer)
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            for task in tasks:
+                task.cancel()
+            writer.close()
+
+
+async def _start_server(args: argparse.Namespace, stats: SimStats):
+    from custom_components.airnut.socket_server import AirnutAsyncSocketServer
+
+    server = AirnutAsyncSocketServer({
+        "scan_interval": args.scan_interval,
+        "workers": args.workers,
+        "publish_window": args.publish_window,
+        "listeners": [{"host": args.host, "port": args.port}],
+    })
+    await server.start()
+    if args.workers:
+        await asyncio.sleep(2)  # 等待子进程启动并绑定端口
+
+    def _on_batch(batch) -> None:
+        now = time.perf_counter()
+        for device_key in batch:
+            sent = stats.sent_at.get(device_key)
+            if sent is not None:
+                stats.latencies.append(now - sent)
+
+    server.add_listener(_on_batch)
+    return server
+
+
+def _frames_ingested(server) -> int:
+    """Frames decoded by the server; in worker mode, readings forwarded by the workers."""
+    # 不能按批次条目计数：同一发布窗口内同一设备的多条读数会合并为一条
+    return server._pool.records if server._pool else server.metrics.frames
+
+
+def _rss_mb() -> tuple[float, float]:
+    """Current and peak resident set size in MiB."""
+    current = 0.0
+    try:
+        with open("/proc/self/status", encoding="ascii") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    current = int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return current, peak
+
+
+def _percentile(values: list[float], pct: float) -> float:
+    if not values:
+        return float("nan")
+    if len(values) == 1:
+        return values[0]
+    return statistics.quantiles(values, n=100, method="inclusive")[int(pct) - 1]
+
+
+async def _run(args: argparse.Namespace) -> None:
+    stats = SimStats()
+    server = await _start_server(args, stats) if args.in_process else None
+
+    devices = [VirtualDevice(i, args, stats) for i in range(args.devices)]
+    start = time.perf_counter()
+    tasks = []
+    for device in devices:
+        tasks.append(asyncio.create_task(device.run()))
+        if args.ramp:
+            await asyncio.sleep(args.ramp / args.devices)
+    # 等待所有设备完成连接
+    while stats.connected + stats.connect_failed < args.devices:
+        await asyncio.sleep(0.01)
+    connect_time = time.perf_counter() - start
+
+    frames_before = stats.frames_sent
+    ingested_before = _frames_ingested(server) if server is not None else 0
+    await asyncio.sleep(args.duration)
+    elapsed = args.duration
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    if server is not None:
+        ingested = _frames_ingested(server) - ingested_before
+        await server.stop()
+
+    current_rss, peak_rss = _rss_mb()
+    print(f"devices            {stats.connected} connected, {stats.connect_failed} failed")
+    print(f"connections/s      {stats.connected / connect_time:10.1f}")
+    print(f"frames sent/s      {(stats.frames_sent - frames_before) / elapsed:10.1f}")
+    print(f"get received       {stats.gets_received}")
+    if args.in_process:
+        print(f"frames ingested/s  {ingested / elapsed:10.1f}")
+        print(f"ingest p50 (ms)    {_percentile(stats.latencies, 50) * 1000:10.3f}")
+        print(f"ingest p99 (ms)    {_percentile(stats.latencies, 99) * 1000:10.3f}")
+        publish = server.metrics.as_dict()
+        print(f"publish delay p99  {publish['publish_delay']['p99_ms'] or 0:10.3f} ms")
+        print(f"mean batch size    {publish['mean_batch_size'] or 0:10.2f}")
+    print(f"RSS (MiB)          {current_rss:10.1f} (peak {peak_rss:.1f})")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Simulated Airnut 1S fleet and load benchmark")
+    parser.add_argument("--devices", type=int, default=100)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=10511)
+    parser.add_argument("--duration", type=float, default=10.0, help="measurement time after all devices connect (s)")
+    parser.add_argument("--ramp", type=float, default=0.0, help="spread connection attempts over this many seconds")
+    parser.add_argument("--post-interval", type=float, default=1.0, help="unsolicited post interval per device (0 = only answer get)")
+    parser.add_argument("--fragment", type=int, default=0, help="split frames into random chunks of at most N bytes")
+    parser.add_argument("--stall", type=float, default=0.0, help="probability a device stops reading")
+    parser.add_argument("--in-process", action="store_true", help="run AirnutAsyncSocketServer in this process")
+    parser.add_argument("--scan-interval", type=int, default=5, help="server scan interval with --in-process")
+    parser.add_argument("--workers", type=int, default=0, help="server worker processes with --in-process")
+    parser.add_argument("--publish-window", type=float, default=20, help="server publish window (ms) with --in-process")
+    args = parser.parse_args()
+
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    wanted = min(hard, max(soft, args.devices * 2 + 256))
+    if wanted > soft:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (wanted, hard))
+
+    asyncio.run(_run(args))
+
+
+if __name__ == "__main__":
+    main()
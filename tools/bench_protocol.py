@@ -0,0 +1,138 @@
+"""Micro-benchmark for the Airnut protocol hot paths.
+
+Compares building the ``get`` command on every poll (the old behaviour)
+with the pre-encoded GET_CMD constant, and times decoding of a typical
+``post`` frame with the active JSON backend. It also measures the memory
+of one stored reading (the old dataclass with a datetime vs the slotted
+record), the memory kept per device for a fleet, and the bytes allocated
+while handling one ``post`` frame.
+
+Usage: python tools/bench_protocol.py [--number N] [--devices N]
+"""
+import argparse
+import asyncio
+import json
+import sys
+import timeit
+import tracemalloc
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from custom_components.airnut import protocol  # noqa: E402
+from custom_components.airnut.socket_server import (  # noqa: E402
+    AirnutAsyncSocketServer,
+    AirnutConnection,
+    AirnutDeviceData,
+)
+
+POST_FRAME = json.dumps({
+    "p": "post",
+    "type": "client",
+    "param": {"indoor": {"t": "23.4", "h": "41.2", "pm25": "12", "co2": "620"}},
+}).encode("utf-8")
+
+
+def _encode_get_inline() -> bytes:
+    get_cmd = {
+        "sendback_appserver": 100000007,
+        "param": {"socket_id": 100000007, "type": 1, "check_key": "s_get19085"},
+        "p": "get",
+        "type": "control",
+        "check_key": "s_get19085",
+    }
+    return json.dumps(get_cmd).encode("utf-8")
+
+
+def _encode_get_cached() -> bytes:
+    return protocol.GET_CMD
+
+
+@dataclass
+class _LegacyDeviceData:
+    """The reading record before it was slotted (for comparison)."""
+    temperature: float | None = None
+    humidity: float | None = None
+    pm25: int | None = None
+    co2: int | None = None
+    last_update: datetime | None = None
+
+
+def _traced_bytes(build) -> int:
+    """Bytes still allocated after build() returns (result kept alive)."""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = build()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del result
+    return after - before
+
+
+def _bench_records(count: int) -> None:
+    legacy = _traced_bytes(lambda: [
+        _LegacyDeviceData(20.0 + i % 10 / 10, 45.5, i % 100, 400 + i, datetime.now())
+        for i in range(count)
+    ]) / count
+    slotted = _traced_bytes(lambda: [
+        AirnutDeviceData(20.0 + i % 10 / 10, 45.5, i % 100, 400 + i, float(i))
+        for i in range(count)
+    ]) / count
+    print(f"{'reading record (dataclass)':<32} {legacy:10.1f} B")
+    print(f"{'reading record (slotted)':<32} {slotted:10.1f} B")
+
+
+async def _bench_server(devices: int, frames: int) -> None:
+    server = AirnutAsyncSocketServer({"history_size": 1})
+    conns = [
+        AirnutConnection(None, (f"10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}", 40000))
+        for i in range(devices)
+    ]
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    for conn in conns:
+        server._parse_device_data(conn, POST_FRAME + protocol.FRAME_DELIMITER)
+    server._publish()
+    per_device = (tracemalloc.get_traced_memory()[0] - before) / devices
+
+    # 稳态：同一设备反复上报，只统计处理单帧时的瞬时分配
+    conn = conns[0]
+    total = 0
+    for _ in range(frames):
+        current = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        server._parse_device_data(conn, POST_FRAME + protocol.FRAME_DELIMITER)
+        total += tracemalloc.get_traced_memory()[1] - current
+    tracemalloc.stop()
+    server._publish()
+    print(f"{'server memory per device':<32} {per_device:10.1f} B (history_size=1, {devices} devices)")
+    print(f"{'allocated per post frame':<32} {total / frames:10.1f} B")
+
+
+def _report(label: str, func, number: int) -> float:
+    per_call = min(timeit.repeat(func, number=number, repeat=5)) / number
+    print(f"{label:<32} {per_call * 1e9:10.1f} ns/op")
+    return per_call
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--number", type=int, default=200_000)
+    parser.add_argument("--devices", type=int, default=10_000, help="fleet size for the memory benchmark")
+    args = parser.parse_args()
+
+    assert _encode_get_inline() == protocol.GET_CMD
+    print(f"JSON backend: {protocol.JSON_BACKEND}")
+    before = _report("get encode (per poll, inline)", _encode_get_inline, args.number)
+    after = _report("get encode (pre-encoded)", _encode_get_cached, args.number)
+    print(f"{'speedup':<32} {before / after:10.1f}x")
+    _report("post decode (json)", lambda: json.loads(POST_FRAME), args.number)
+    _report(f"post decode ({protocol.JSON_BACKEND})", lambda: protocol.decode_frame(POST_FRAME), args.number)
+    _bench_records(args.devices)
+    asyncio.run(_bench_server(args.devices, 1000))
+
+
+if __name__ == "__main__":
+    main()